@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+Columnar Filter Benchmark
+=========================
+
+Compares the per-device filter loop (filter_devices) with the columnar
+inventory (--columnar) for --offline_days and --no_group on synthetic
+fleets. The columnar filter is measured with NumPy (if installed) and with
+the pure 'array' fallback.
+
+Usage:
+   python3 benchmarks/bench_columnar.py --sizes 10000,100000,1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import rustdesk_cleaner  # noqa: E402
+from rustdesk_cleaner import ColumnarInventory, Device, filter_devices, offline_cutoff  # noqa: E402
+
+
+def make_pages(count, page_size=100, seed=1):
+    """Returns 'count' synthetic devices split into API-shaped pages."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    groups = [f"group{i}" for i in range(20)]
+    pages = []
+    for start in range(0, count, page_size):
+        data = []
+        for i in range(start, min(start + page_size, count)):
+            offline = timedelta(seconds=rng.uniform(0, 365 * 86400))
+            data.append({
+                "guid": f"{i:032x}",
+                "id": str(100000000 + i),
+                "last_online": (now - offline).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+                "device_group_name": "" if rng.random() < 0.3 else rng.choice(groups),
+            })
+        pages.append({"total": count, "data": data})
+    return pages
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar filter benchmark")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated fleet sizes")
+    parser.add_argument("--offline_days", type=int, default=30, help="Offline duration in days (default: 30)")
+    args = parser.parse_args()
+
+    cutoff = offline_cutoff(args.offline_days)
+    numpy_module = rustdesk_cleaner.numpy
+    print(f"{'devices':>10} {'loop':>10} {'build':>10} {'numpy':>10} {'array':>10}   matches")
+    for size in (int(value) for value in args.sizes.split(",")):
+        pages = make_pages(size)
+
+        loop_time, loop_devices = timed(lambda: [
+            Device.from_json(device)
+            for page in pages
+            for device in filter_devices(page["data"], cutoff, True)
+        ])
+
+        inventory = ColumnarInventory()
+        build_time, _ = timed(lambda: [inventory.add_page(page["data"]) for page in pages])
+
+        numpy_time = None
+        if numpy_module is not None:
+            numpy_time, rows = timed(lambda: inventory.matching_rows(cutoff, True))
+            assert len(rows) == len(loop_devices)
+        rustdesk_cleaner.numpy = None
+        array_time, rows = timed(lambda: inventory.matching_rows(cutoff, True))
+        rustdesk_cleaner.numpy = numpy_module
+        assert len(rows) == len(loop_devices)
+
+        numpy_text = f"{numpy_time * 1000:8.1f}ms" if numpy_time is not None else f"{'n/a':>10}"
+        print(
+            f"{size:>10} {loop_time * 1000:8.1f}ms {build_time * 1000:8.1f}ms "
+            f"{numpy_text} {array_time * 1000:8.1f}ms   {len(rows)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
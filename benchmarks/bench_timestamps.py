@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+"""
+Offline Filter Microbenchmark
+=============================
+
+Compares the original '--offline_days' check (strptime + utcnow per device)
+with the OfflineCutoff used by rustdesk_cleaner.py today.
+
+Usage:
+   python3 benchmarks/bench_timestamps.py --count 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rustdesk_cleaner import OfflineCutoff, last_online_epoch  # noqa: E402
+
+
+def make_timestamps(count, seed=1):
+    """Returns 'count' last_online values in the API format, spread over one year."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    return [
+        (now - timedelta(seconds=rng.uniform(0, 365 * 86400))).strftime("%Y-%m-%dT%H:%M:%S.%f")
+        for _ in range(count)
+    ]
+
+
+def legacy_filter(values, offline_days):
+    matched = 0
+    for value in values:
+        last_online = datetime.strptime(value.split(".")[0], "%Y-%m-%dT%H:%M:%S")
+        if (datetime.utcnow() - last_online).days >= offline_days:
+            matched += 1
+    return matched
+
+
+def cutoff_filter(values, offline_days):
+    cutoff = OfflineCutoff(offline_days)
+    return sum(1 for value in values if cutoff.matches(value))
+
+
+def parse_all(values):
+    return sum(1 for value in values if last_online_epoch(value))
+
+
+def measure(name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed * 1000:10.1f} ms   (result: {result})")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline filter microbenchmark")
+    parser.add_argument("--count", type=int, default=1000000, help="Number of timestamps (default: 1000000)")
+    parser.add_argument("--offline_days", type=int, default=30, help="Offline duration in days (default: 30)")
+    args = parser.parse_args()
+
+    values = make_timestamps(args.count)
+    print(f"{args.count} timestamps, offline_days={args.offline_days}")
+    legacy = measure("strptime + utcnow per row", legacy_filter, values, args.offline_days)
+    fast = measure("OfflineCutoff", cutoff_filter, values, args.offline_days)
+    measure("last_online_epoch (parse)", parse_all, values)
+    print(f"Speedup: {legacy / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic Fleet Generator
+=========================
+
+Generates device records in the shape of the RustDesk Pro device list
+(the records view() consumes), with distributions that look like a real
+fleet instead of uniform noise:
+
+- last_online ages are heavy-tailed: a share of devices was seen within the
+  last hour, most were seen within days and a long tail has been gone for
+  months or years (Lomax/Pareto distribution, capped at --max_age_days)
+- a configurable share of devices are Quick Support clients: no device
+  group, no user, and they rarely come back, so they skew old
+- group and user sizes follow a Zipf-like distribution (a few large groups,
+  many small ones)
+- last_online has fractional seconds like the real API
+
+Records are generated lazily, so millions of rows can be streamed as NDJSON
+(one device per line) without holding the fleet in memory. The output can
+feed the mock server (mock_server.py --fleet) or the inventory snapshot
+cache (--cache_file).
+
+Usage:
+   python3 benchmarks/fleet_generator.py --devices 1000000 --output fleet.ndjson
+   python3 benchmarks/fleet_generator.py --devices 100000 --ungrouped_share 0.6 | head
+   python3 benchmarks/fleet_generator.py --devices 100000 --cache_file rustdesk_inventory.db
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+
+def zipf_weights(count, exponent=1.1):
+    """Returns cumulative weights for picking one of 'count' names with Zipf-like sizes."""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def generate_fleet(
+    count,
+    seed=1,
+    ungrouped_share=0.3,
+    online_share=0.1,
+    median_days=7.0,
+    tail=1.2,
+    max_age_days=3 * 365,
+    groups=50,
+    users=500,
+    now=None,
+):
+    """
+    Yields 'count' synthetic devices.
+
+    - ungrouped_share: share of Quick Support clients without group and user
+    - online_share: share of devices seen within the last hour
+    - median_days / tail: median offline age and Pareto shape of the other
+      devices; a smaller 'tail' means more devices that were gone for long
+    """
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    group_names = [f"group{i}" for i in range(groups)]
+    user_names = [f"user{i}" for i in range(users)]
+    group_weights = zipf_weights(groups)
+    user_weights = zipf_weights(users)
+    # Lomax scale that puts the median offline age at 'median_days'
+    scale = median_days / (2 ** (1 / tail) - 1)
+
+    for i in range(count):
+        quick_support = rng.random() < ungrouped_share
+        if rng.random() < online_share:
+            age_days = rng.uniform(0, 1 / 24)
+        else:
+            # Quick Support clients are one-off sessions and rarely come back
+            age_days = (rng.paretovariate(tail) - 1) * scale * (4 if quick_support else 1)
+            age_days = min(age_days, max_age_days)
+        last_online = now - timedelta(days=age_days)
+        if quick_support:
+            device_group_name, user_name, group_name = "", None, None
+            device_name = f"QS-{rng.getrandbits(24):06X}"
+        else:
+            device_group_name = rng.choices(group_names, cum_weights=group_weights)[0]
+            user_name = rng.choices(user_names, cum_weights=user_weights)[0]
+            group_name = "Default"
+            device_name = f"PC-{i}"
+        yield {
+            "guid": f"{i:032x}",
+            "id": str(100000000 + i),
+            "device_name": device_name,
+            "user_name": user_name,
+            "group_name": group_name,
+            "device_group_name": device_group_name,
+            "strategy_name": "default",
+            "note": "",
+            "status": 1,
+            "is_online": age_days < 1 / 1440,
+            "last_online": last_online.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        }
+
+
+def write_ndjson(devices, file):
+    """Writes the devices to an open text file, one JSON object per line. Returns the count."""
+    count = 0
+    for device in devices:
+        file.write(json.dumps(device, separators=(",", ":")))
+        file.write("\n")
+        count += 1
+    return count
+
+
+def read_ndjson(path):
+    """Yields the devices of an NDJSON file ('-' reads stdin)."""
+    file = sys.stdin if path == "-" else open(path)
+    try:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def as_pages(devices, page_size=100):
+    """Groups the devices into API-shaped pages ({"data": [...]}) without knowing the total."""
+    iterator = iter(devices)
+    while True:
+        data = list(itertools.islice(iterator, page_size))
+        if not data:
+            return
+        yield {"data": data}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic RustDesk fleet generator (NDJSON)")
+    parser.add_argument("--devices", type=int, default=10000, help="Number of devices (default: 10000)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    parser.add_argument("--ungrouped_share", type=float, default=0.3, help="Share of ungrouped Quick Support clients (default: 0.3)")
+    parser.add_argument("--online_share", type=float, default=0.1, help="Share of devices seen within the last hour (default: 0.1)")
+    parser.add_argument("--median_days", type=float, default=7.0, help="Median offline age in days (default: 7)")
+    parser.add_argument("--tail", type=float, default=1.2, help="Pareto shape of offline ages, smaller = heavier tail (default: 1.2)")
+    parser.add_argument("--max_age_days", type=float, default=3 * 365, help="Oldest possible last_online in days (default: 1095)")
+    parser.add_argument("--groups", type=int, default=50, help="Number of device groups (default: 50)")
+    parser.add_argument("--users", type=int, default=500, help="Number of users (default: 500)")
+    parser.add_argument("--output", default="-", help="NDJSON output file, '-' for stdout (default: -)")
+    parser.add_argument("--cache_file", help="Store the fleet in this inventory snapshot instead of writing NDJSON")
+    args = parser.parse_args()
+
+    devices = generate_fleet(
+        args.devices,
+        seed=args.seed,
+        ungrouped_share=args.ungrouped_share,
+        online_share=args.online_share,
+        median_days=args.median_days,
+        tail=args.tail,
+        max_age_days=args.max_age_days,
+        groups=args.groups,
+        users=args.users,
+    )
+
+    if args.cache_file:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+        from rustdesk_cleaner import InventoryCache
+
+        InventoryCache(args.cache_file).store(as_pages(devices))
+        print(f"Stored {args.devices} devices in {args.cache_file}", file=sys.stderr)
+    elif args.output == "-":
+        write_ndjson(devices, sys.stdout)
+    else:
+        with open(args.output, "w") as f:
+            count = write_ndjson(devices, f)
+        print(f"Wrote {count} devices to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+"""
+Mock RustDesk Pro API Server
+============================
+
+A stand-in for the RustDesk Server Pro device API, for benchmarking and
+testing rustdesk_cleaner.py without a real server. It serves an in-memory
+synthetic fleet and implements:
+
+- GET    /api/devices                 (paging with pageSize/current, search filters)
+- POST   /api/devices/{guid}/disable
+- POST   /api/devices/{guid}/enable
+- POST   /api/devices/{guid}/assign   (JSON body: {"type": ..., "value": ...})
+- DELETE /api/devices/{guid}          (only allowed for disabled devices)
+
+Latency, jitter, random errors and 429 throttling can be injected.
+
+Usage:
+   python3 benchmarks/mock_server.py --devices 10000 --latency_ms 50 --port 21114
+   python3 benchmarks/mock_server.py --fleet fleet.ndjson
+   python3 rustdesk_cleaner.py view --url http://127.0.0.1:21114 --token test
+"""
+
+import argparse
+import json
+import random
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from fleet_generator import generate_fleet, read_ndjson
+
+SEARCH_FIELDS = ("id", "device_name", "user_name", "group_name", "device_group_name")
+ASSIGN_TYPES = ("ab", "strategy_name", "user_name", "device_group_name", "note", "device_username", "device_name")
+
+
+def simple_fleet(count, seed=1):
+    """Returns 'count' devices with uniform last_online ages and 30% ungrouped."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    fleet = []
+    for i in range(count):
+        last_online = now - timedelta(seconds=rng.uniform(0, 365 * 86400))
+        grouped = rng.random() >= 0.3
+        fleet.append({
+            "guid": f"{i:032x}",
+            "id": str(100000000 + i),
+            "device_name": f"PC-{i}",
+            "user_name": f"user{i % 50}" if grouped else None,
+            "group_name": "Default" if grouped else None,
+            "device_group_name": f"group{i % 20}" if grouped else "",
+            "strategy_name": "default",
+            "note": "",
+            "status": 1,
+            "is_online": False,
+            "last_online": last_online.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        })
+    return fleet
+
+
+def like_matcher(pattern):
+    """Returns a function matching values like the server's SQL LIKE search."""
+    if pattern == "-":
+        return lambda value: not value
+    regex = re.compile(
+        "^" + ".*".join(re.escape(part) for part in pattern.split("%")) + "$", re.IGNORECASE | re.DOTALL
+    )
+    return lambda value: value is not None and regex.match(str(value)) is not None
+
+
+class FleetState:
+    """Thread-safe in-memory fleet with cached filtered views for paging."""
+
+    def __init__(self, devices):
+        self.devices = {device["guid"]: device for device in devices}
+        self.lock = threading.Lock()
+        self.version = 0
+        self._views = {}
+
+    def search(self, filters):
+        key = tuple(sorted(filters.items()))
+        with self.lock:
+            cached = self._views.get(key)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            matchers = [(field, like_matcher(pattern)) for field, pattern in filters.items()]
+            rows = [
+                device for device in self.devices.values()
+                if all(match(device.get(field)) for field, match in matchers)
+            ]
+            self._views[key] = (self.version, rows)
+            return rows
+
+    def update(self, guid, action, body=None):
+        """Applies a write action and returns (status_code, response_json)."""
+        with self.lock:
+            device = self.devices.get(guid)
+            if device is None:
+                return 404, {"error": "Device not found"}
+            if action == "disable":
+                device["status"] = 0
+            elif action == "enable":
+                device["status"] = 1
+            elif action == "assign":
+                body = body or {}
+                if body.get("type") not in ASSIGN_TYPES:
+                    return 400, {"error": "Invalid type"}
+                device[body["type"]] = body.get("value")
+                self.version += 1
+            elif action == "delete":
+                if device["status"] != 0:
+                    return 400, {"error": "Device must be disabled before it can be deleted"}
+                del self.devices[guid]
+                self.version += 1
+            return 200, {}
+
+
+class Throttle:
+    """Fixed one-second window request counter used to answer HTTP 429."""
+
+    def __init__(self, max_rps):
+        self.max_rps = max_rps
+        self.window = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if not self.max_rps:
+            return True
+        with self.lock:
+            window = int(time.monotonic())
+            if window != self.window:
+                self.window, self.count = window, 0
+            self.count += 1
+            return self.count <= self.max_rps
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockRustDesk/1.0"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; avoid Nagle/delayed-ACK stalls on keep-alive
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_response(self, code, message=None):
+        # Record per-request latency for the benchmark suite
+        if self.server.request_log is not None:
+            kind = "read" if self.command == "GET" else "write"
+            self.server.request_log.append((kind, code, time.perf_counter() - self.started))
+        super().send_response(code, message)
+
+    def parse_request(self):
+        self.started = time.perf_counter()
+        return super().parse_request()
+
+    def prepare(self):
+        """Applies authentication and injected faults. Returns False if the request was answered."""
+        options = self.server.options
+        delay = options.latency_ms + random.uniform(-options.jitter_ms, options.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if options.token and self.headers.get("Authorization") != f"Bearer {options.token}":
+            self.send_json(401, {"error": "Invalid token"})
+            return False
+        if not self.server.throttle.allow():
+            self.send_json(429, {"error": "Too many requests"}, {"Retry-After": "1"})
+            return False
+        if options.error_rate and random.random() < options.error_rate:
+            self.send_json(500, {"error": "Injected server error"})
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/api/devices":
+            return self.send_json(404, {"error": "Not found"})
+        if not self.prepare():
+            return
+        query = parse_qs(url.query)
+        page_size = int(query.get("pageSize", ["10"])[0])
+        current = int(query.get("current", ["1"])[0])
+        if self.server.options.max_page_size and page_size > self.server.options.max_page_size:
+            page_size = self.server.options.max_page_size
+        filters = {field: query[field][0] for field in SEARCH_FIELDS if field in query}
+        rows = self.server.state.search(filters)
+        start = (current - 1) * page_size
+        self.send_json(200, {"total": len(rows), "data": rows[start:start + page_size]})
+
+    def write_action(self, method):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        # api/devices/{guid}[/action]
+        if len(parts) < 3 or parts[:2] != ["api", "devices"]:
+            return self.send_json(404, {"error": "Not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not self.prepare():
+            return
+        if method == "DELETE" and len(parts) == 3:
+            action = "delete"
+        elif method == "POST" and len(parts) == 4 and parts[3] in ("disable", "enable", "assign"):
+            action = parts[3]
+        else:
+            return self.send_json(404, {"error": "Not found"})
+        body = json.loads(raw) if raw else None
+        status, payload = self.server.state.update(parts[2], action, body)
+        self.send_json(status, payload)
+
+    def do_POST(self):
+        self.write_action("POST")
+
+    def do_DELETE(self):
+        self.write_action("DELETE")
+
+
+def start_server(devices, host="127.0.0.1", port=0, **options):
+    """
+    Starts the mock server in a background thread and returns it.
+
+    The URL is available as 'server.url'; call 'server.shutdown()' to stop it.
+    Options: token, latency_ms, jitter_ms, error_rate, max_rps, max_page_size, verbose.
+    With record=True, (kind, status, seconds) of every request is appended
+    to 'server.request_log'.
+    """
+    record = options.pop("record", False)
+    defaults = {
+        "token": None, "latency_ms": 0.0, "jitter_ms": 0.0, "error_rate": 0.0,
+        "max_rps": None, "max_page_size": None, "verbose": False,
+    }
+    defaults.update(options)
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.options = argparse.Namespace(**defaults)
+    server.state = FleetState(devices)
+    server.throttle = Throttle(server.options.max_rps)
+    server.request_log = [] if record else None
+    server.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock RustDesk Pro API server")
+    parser.add_argument("--host", default="127.0.0.1", help="Listen address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=21114, help="Listen port (default: 21114)")
+    parser.add_argument("--devices", type=int, default=1000, help="Number of synthetic devices (default: 1000)")
+    parser.add_argument("--realistic", action="store_true", help="Generate a heavy-tailed fleet (fleet_generator.py) instead of a uniform one")
+    parser.add_argument("--fleet", help="Serve the devices of this NDJSON file ('-' for stdin) instead of a generated fleet")
+    parser.add_argument("--token", help="Require this bearer token (default: accept any)")
+    parser.add_argument("--latency_ms", type=float, default=0.0, help="Added latency per request in ms")
+    parser.add_argument("--jitter_ms", type=float, default=0.0, help="Random +/- latency jitter in ms")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of requests answered with HTTP 500 (0-1)")
+    parser.add_argument("--max_rps", type=int, help="Answer HTTP 429 above this many requests per second")
+    parser.add_argument("--max_page_size", type=int, help="Cap pageSize like a server limit")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    if args.fleet:
+        devices = list(read_ndjson(args.fleet))
+    elif args.realistic:
+        devices = list(generate_fleet(args.devices))
+    else:
+        devices = simple_fleet(args.devices)
+
+    server = start_server(
+        devices,
+        args.host,
+        args.port,
+        token=args.token,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        max_rps=args.max_rps,
+        max_page_size=args.max_page_size,
+        verbose=args.verbose,
+    )
+    print(f"Mock RustDesk API with {len(devices)} devices listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
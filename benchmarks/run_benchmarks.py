@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+"""
+End-to-End Benchmark Suite
+==========================
+
+Runs rustdesk_cleaner.py commands (view, disable, delete, assign) against
+the local mock server (mock_server.py) for a matrix of fleet sizes, page
+sizes, worker counts and injected latencies, and reports:
+
+- throughput in devices scanned per second (and slots freed per minute for delete)
+- p50/p95/p99 request latency, as measured by the mock server
+- peak RSS of the cleaner process
+
+Every scenario starts a fresh fleet and runs the cleaner as a separate
+process. Results are written as JSON (default: benchmarks/results/, ignored by
+git) so runs can be compared over time.
+
+Usage:
+   python3 benchmarks/run_benchmarks.py --sizes 1000,10000 --commands view,delete --workers 1,8
+   python3 benchmarks/run_benchmarks.py --sizes 100000 --latency_ms 50 --output results.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CLEANER = os.path.join(BENCH_DIR, "..", "rustdesk_cleaner.py")
+sys.path.insert(0, BENCH_DIR)
+
+from fleet_generator import generate_fleet  # noqa: E402
+from mock_server import simple_fleet, start_server  # noqa: E402
+
+TOKEN = "benchmark-token"
+
+FLEETS = {
+    "uniform": simple_fleet,
+    "realistic": lambda size: list(generate_fleet(size)),
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def cleaner_command(command, url, page_size, workers, extra):
+    args = [
+        sys.executable, CLEANER, command,
+        "--url", url,
+        "--token", TOKEN,
+        "--log_file", os.devnull,
+        "--cache_file", "",
+        "--journal_file", "",
+        "--fetch_workers", str(workers),
+        "--action_workers", str(workers),
+        "--yes",
+    ]
+    if page_size is not None:
+        args += ["--page_size", str(page_size)]
+    if command != "view":
+        args += ["--no_dry_run", "--offline_days", "180"]
+    if command == "assign":
+        args += ["--assign_to", "note=benchmark"]
+    return args + extra
+
+
+def run_scenario(size, command, page_size, workers, latency_ms, extra, fleet="uniform"):
+    """Runs one scenario against a fresh mock server and returns its result record."""
+    server = start_server(FLEETS[fleet](size), token=TOKEN, latency_ms=latency_ms, record=True)
+    try:
+        before = len(server.state.devices)
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            cleaner_command(command, server.url, page_size, workers, extra),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        # wait4 returns the resource usage of this child only
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        after = len(server.state.devices)
+        log = list(server.request_log)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    latencies = [seconds * 1000 for _, _, seconds in log]
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak_rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return {
+        "devices": size,
+        "fleet": fleet,
+        "command": command,
+        "page_size": page_size,
+        "workers": workers,
+        "latency_ms": latency_ms,
+        "exit_code": process.returncode,
+        "wall_seconds": round(wall, 3),
+        "devices_per_second": round(size / wall, 1),
+        "slots_freed_per_minute": round((before - after) / wall * 60, 1) if command == "delete" else None,
+        "requests": len(log),
+        "reads": sum(1 for kind, _, _ in log if kind == "read"),
+        "writes": sum(1 for kind, _, _ in log if kind == "write"),
+        "errors": sum(1 for _, code, _ in log if code != 200),
+        "latency_p50_ms": round(percentile(latencies, 0.50) or 0, 2),
+        "latency_p95_ms": round(percentile(latencies, 0.95) or 0, 2),
+        "latency_p99_ms": round(percentile(latencies, 0.99) or 0, 2),
+        "peak_rss_mb": round(peak_rss, 1),
+    }
+
+
+def integers(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark suite for rustdesk_cleaner.py")
+    parser.add_argument("--sizes", type=integers, default=[1000, 10000], help="Fleet sizes (default: 1000,10000)")
+    parser.add_argument("--commands", default="view,delete", help="Commands to run (default: view,delete)")
+    parser.add_argument("--page_sizes", default="", help="Page sizes passed as --page_size (default: cleaner default)")
+    parser.add_argument("--workers", type=integers, default=[1, 8], help="Fetch and action worker counts (default: 1,8)")
+    parser.add_argument("--latency_ms", default="0,20", help="Injected server latency in ms (default: 0,20)")
+    parser.add_argument("--fleet", choices=sorted(FLEETS), default="uniform", help="Fleet distribution (default: uniform)")
+    parser.add_argument("--extra", default="", help="Extra arguments for the cleaner, e.g. \"--engine async\"")
+    parser.add_argument("--output", help="JSON output file (default: benchmarks/results/bench-<timestamp>.json)")
+    args = parser.parse_args()
+
+    page_sizes = integers(args.page_sizes) or [None]
+    latencies = [float(value) for value in args.latency_ms.split(",") if value]
+    commands = [value for value in args.commands.split(",") if value]
+    extra = args.extra.split()
+
+    started = datetime.now()
+    results = []
+    print(f"{'devices':>8} {'command':>8} {'page':>5} {'wrk':>4} {'lat':>5} {'wall s':>8} {'dev/s':>9} "
+          f"{'freed/min':>10} {'p50':>7} {'p95':>7} {'p99':>7} {'rss MB':>7}")
+    for size, command, page_size, workers, latency in itertools.product(
+        args.sizes, commands, page_sizes, args.workers, latencies
+    ):
+        result = run_scenario(size, command, page_size, workers, latency, extra, args.fleet)
+        results.append(result)
+        freed = result["slots_freed_per_minute"]
+        print(
+            f"{size:>8} {command:>8} {str(page_size or '-'):>5} {workers:>4} {latency:>5g} "
+            f"{result['wall_seconds']:>8.2f} {result['devices_per_second']:>9.0f} "
+            f"{(f'{freed:.0f}' if freed is not None else '-'):>10} {result['latency_p50_ms']:>7.1f} "
+            f"{result['latency_p95_ms']:>7.1f} {result['latency_p99_ms']:>7.1f} {result['peak_rss_mb']:>7.1f}"
+            + ("" if result["exit_code"] == 0 else f"  (exit code {result['exit_code']})")
+        )
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"bench-{started.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "started": started.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fleet": args.fleet,
+            "extra_args": extra,
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
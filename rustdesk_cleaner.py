@@ -37,6 +37,12 @@ How to create a Cronjob:
 
 3. Save and exit. The script will now run automatically.
 
+Alternatively, run the script as a long-lived daemon with its own schedule.
+It keeps one warm connection and the device inventory in memory, refreshes
+the inventory between runs and only re-checks the matching devices when a
+run is due:
+   python3 rustdesk_cleaner.py daemon --policy delete --schedule "0 1 * * *" --yes
+
 Important Override Parameters (CLI):
 ------------------------------------
 --offline_days X : Overrides config with X days.
@@ -46,181 +52,2819 @@ Important Override Parameters (CLI):
 --yes            : Confirms actions immediately (required for cron).
 --only_disable   : Only disables clients without deleting them.
 --disable_before_delete: (Default: True) Ensures mandatory disabling before deletion.
+--page_size X    : Number of devices requested per device list page (Default: 100).
+                   "auto" probes larger pages and keeps the most efficient size in the snapshot.
+--fetch_workers X: Number of device pages fetched in parallel (Default: 4).
+--action_workers X: Number of devices disabled/deleted in parallel (Default: 4).
+--stream         : Starts actions while the device list is still being fetched.
+--count          : Only prints the number of matching devices ('view'). Without --offline_days and
+                   --no_group this takes a single request, using the total reported by the server.
+--fields a,b     : Keeps and prints extra device fields ("*": all). 'view' prints all fields by default,
+                   other commands keep guid, id, last_online and group.
+--mem_report     : Logs per-field memory use of interned group/user/strategy names.
+--columnar       : Filters large inventories as arrays, without the snapshot (faster with: pip install numpy).
+--engine async   : Uses the asyncio engine (requires: pip install aiohttp).
+--no_adaptive    : Disables the adaptive limit on concurrent requests (backs off on 429/5xx).
+--max_rps X      : Caps all requests per second; --max_read_rps / --max_write_rps add budgets within it.
+--stats_json F   : Writes the run statistics (phase times, request latencies) as JSON to F.
+--hedge          : Sends a duplicate request for device list pages slower than the recent p95.
+--read_timeout X : Seconds to wait for an answer (--connect_timeout X for the connection).
+--deadline X     : Stops the run after X seconds; devices not started yet are skipped.
+--max_retries X  : Retries each request up to X times on HTTP 429/5xx and connection errors.
+--max_errors X   : Aborts after X failed devices instead of continuing (Default: unlimited).
+--max_error_rate F: Aborts when more than F (0-1) of the processed devices failed.
+--resume         : Continues an interrupted disable/enable/delete/assign run from its journal.
+--policy X       : Command the daemon runs on schedule (Default: delete).
+--schedule "..." : Cron-like daemon schedule, e.g. "0 1 * * *" (daily at 01:00).
+--daemon_refresh X: Seconds between full inventory scans of the daemon (Default: 21600).
+--prom_file F    : Writes Prometheus metrics for node_exporter's textfile collector to F.
+--refresh        : Rescans the server even if the inventory snapshot is still fresh.
+--offline        : Answers from the inventory snapshot only (disable/delete: only if younger than --cache_ttl).
 """
 
-import requests
-import argparse
-import logging
-from datetime import datetime, timedelta
+import requests
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import warnings
+from array import array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+try:
+    import aiohttp  # Optional, only needed for '--engine async'
+except ImportError:
+    aiohttp = None
+
+try:
+    import numpy  # Optional, speeds up '--columnar' filtering
+except ImportError:
+    numpy = None
+
+# --- CONFIGURATION ---
+DRY_RUN = True           # True = Simulation only | False = Real deletion/disabling
+AUTO_CONFIRM = True      # True = Automatically confirm multiple devices (required for cron)
+API_URL = "https://your-rustdesk-server.com"
+API_TOKEN = "your-bearer-token-here"
+
+# Filter Options (Default values for automated runs)
+DELETE_UNGROUPED = True  # True = Only target devices without a group
+OFFLINE_DAYS = None      # None = Disable filter | Integer (e.g. 3) = Only devices offline for X days
+
+# Process Options
+# NOTE: RustDesk requires devices to be DISABLED before they can be DELETED.
+DISABLE_BEFORE_DELETE = True  # Must stay True for successful deletion in RustDesk
+ONLY_DISABLE = False          # Set to True to only disable clients without deleting them
+
+# Performance Options
+PAGE_SIZE = 100               # Number of devices requested per device list page | "auto" = Probe the most efficient size
+PAGE_SIZE_PROBES = (100, 250, 500, 1000, 2500, 5000)  # Page sizes tried by "auto", smallest first
+PAGE_SIZE_TTL = 7 * 86400     # Seconds a page size found by "auto" is reused before probing again
+FETCH_WORKERS = 4             # Number of device list pages fetched in parallel (1 = sequential)
+ACTION_WORKERS = 4            # Number of devices processed in parallel (1 = sequential)
+STREAM = False                # True = Start actions while the device list is still being fetched
+STREAM_QUEUE_SIZE = 1000      # Maximum number of fetched devices waiting for an action worker
+ENGINE = "threads"            # "threads" = requests + worker threads | "async" = asyncio + aiohttp
+ASYNC_LIMIT = 100             # Maximum number of requests in flight with the async engine
+ADAPTIVE_CONCURRENCY = True   # True = Back off on 429/5xx and latency spikes, ramp up while healthy
+MAX_RPS = None                # None = Unlimited | Number = Max requests per second (reads and writes together)
+MAX_READ_RPS = None           # Additional limit for device list pages (GET /api/devices)
+MAX_WRITE_RPS = None          # Additional limit for disable, enable, delete and assign
+HEDGE_PAGES = False           # True = Send a duplicate request for device list pages slower than the recent p95
+
+# Timeout Options
+CONNECT_TIMEOUT = 10          # Seconds to wait for a connection to the server
+READ_TIMEOUT = 60             # Seconds to wait for the server to answer a request
+RUN_DEADLINE = None           # None = Unlimited | Seconds after which a run stops; devices not started are skipped
+
+# Inventory Snapshot Options
+CACHE_FILE = "rustdesk_inventory.db"  # SQLite snapshot of the device list | None = Disable
+CACHE_TTL = 900                       # Seconds a snapshot is reused by 'view' before rescanning
+
+# Error Handling Options
+MAX_ERRORS = None             # None = Unlimited | Number = Abort after this many failed devices
+MAX_ERROR_RATE = None         # None = Unlimited | 0-1 = Abort when this share of the processed devices failed
+RETRY_ROUNDS = 2              # Number of times devices with retryable errors are queued and tried again
+RETRY_DELAY = 5               # Seconds to wait before each retry round
+# Requests failing with HTTP 429/5xx or a connection error are retried right away, up to these limits per endpoint
+MAX_RETRIES = {"list": 4, "disable": 3, "enable": 3, "assign": 3, "delete": 3}
+BACKOFF_BASE = 0.5            # Seconds before the first retry; later retries back off exponentially with jitter
+BACKOFF_CAP = 30              # Maximum seconds between retries, also for the server's Retry-After
+
+# Journal Options
+JOURNAL_FILE = "rustdesk_cleanup.journal"  # Journal of device steps for --resume | None = Disable
+JOURNAL_SYNC_EVERY = 100                   # Number of journal records written between fsync calls
+
+# Daemon Options ('daemon' command)
+DAEMON_POLICY = "delete"      # Command run on every scheduled run: view, disable, enable, delete or assign
+DAEMON_SCHEDULE = "0 1 * * *" # Cron-like schedule in local time: minute hour day month day_of_week
+DAEMON_REFRESH = 21600        # Seconds between full inventory scans of the daemon between runs
+
+# Monitoring Options
+PROM_FILE = None  # e.g. "/var/lib/node_exporter/textfile_collector/rustdesk_cleaner.prom" | None = Disable
+# ---------------------
+
+# Fields that can be changed with the 'assign' command
+ASSIGN_TYPES = [
+    "ab",
+    "strategy_name",
+    "user_name",
+    "device_group_name",
+    "note",
+    "device_username",
+    "device_name",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class ApiError(Exception):
+    """Raised when the RustDesk API rejects a device request."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class DeadlineExceeded(ApiError):
+    """Raised instead of sending a request once the run deadline has passed."""
+
+
+class Deadline:
+    """Wall-clock limit of a run. 'seconds' of None means unlimited."""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        """Returns the seconds left, or None without a deadline."""
+        return None if self.at is None else self.at - time.monotonic()
+
+    @property
+    def expired(self):
+        return self.at is not None and time.monotonic() >= self.at
+
+    def check(self):
+        """Raises DeadlineExceeded if the deadline has passed."""
+        if self.expired:
+            raise DeadlineExceeded(f"Run deadline of {self.seconds} s exceeded")
+
+    def timeout(self, connect, read):
+        """Returns the (connect, read) timeouts, shortened to the time left."""
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return connect, read
+        return min(connect, remaining), min(read, remaining)
+
+
+class ConcurrencyController:
+    """
+    AIMD (additive increase, multiplicative decrease) limit on the number of
+    requests in flight, so the cleaner never overloads the API server.
+
+    The limit grows by one after 'limit' healthy responses in a row and is
+    halved on HTTP 429/502/503/504, connection errors, or when a response
+    takes longer than 'latency_factor' times the fastest one seen so far
+    (and at least 'min_spike' seconds longer, so scheduling noise on fast
+    links is not mistaken for overload).
+    Reads and writes keep separate latency baselines because a page of 100
+    devices is naturally slower than a single disable call.
+    """
+
+    BACKOFF_STATUSES = (429, 502, 503, 504)
+
+    def __init__(self, maximum, initial=4, minimum=1, latency_factor=3.0, min_spike=0.05):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(max(self.minimum, min(initial, self.maximum)))
+        self.latency_factor = latency_factor
+        self.min_spike = min_spike
+        self.lowest = self.limit
+        self._baselines = {}
+        self._healthy = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, kind, latency, status):
+        """Updates the limit after a response ('status' is None for connection errors)."""
+        with self._lock:
+            baseline = self._baselines.get(kind)
+            if status is not None and status < 500 and (baseline is None or latency < baseline):
+                self._baselines[kind] = baseline = latency
+
+            reason = None
+            if status is None or status in self.BACKOFF_STATUSES:
+                reason = f"HTTP {status}" if status else "connection error"
+            elif baseline and latency > max(baseline * self.latency_factor, baseline + self.min_spike):
+                reason = f"latency {latency * 1000:.0f} ms (baseline {baseline * 1000:.0f} ms)"
+
+            now = time.monotonic()
+            if reason:
+                self._healthy = 0
+                # Responses already in flight report the same overload, so back off once per round trip
+                if now - self._last_decrease < latency:
+                    return
+                self._last_decrease = now
+                old = int(self.limit)
+                self.limit = max(self.minimum, self.limit / 2)
+                self.lowest = min(self.lowest, self.limit)
+                logger.info(f"Adaptive concurrency: {reason}, reducing limit {old} -> {int(self.limit)}")
+            else:
+                self._healthy += 1
+                if self._healthy >= self.limit and self.limit < self.maximum:
+                    self._healthy = 0
+                    self.limit += 1
+                    logger.info(f"Adaptive concurrency: healthy responses, raising limit to {int(self.limit)}")
+
+    def slots(self):
+        return int(self.limit)
+
+    def log_summary(self):
+        logger.info(
+            f"Adaptive concurrency settled at {int(self.limit)} requests in flight "
+            f"(lowest: {int(self.lowest)}, maximum: {self.maximum})"
+        )
+
+
+class TokenBucket:
+    """
+    Token bucket limiting requests to 'rate' per second, shared by all workers.
+
+    Up to 'burst' requests may start at once; after that, requests are
+    spaced evenly. Callers reserve a token and wait for the returned delay,
+    which keeps waiting workers in FIFO order.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes one token and returns how many seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+# Responses worth retrying later: overload, timeouts and gateway errors
+RETRYABLE_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+
+# Failures of a single API request, recorded per device instead of ending the run
+REQUEST_ERRORS = (ApiError, requests.RequestException, asyncio.TimeoutError) + ((aiohttp.ClientError,) if aiohttp is not None else ())
+
+
+def is_retryable(error):
+    """
+    Classifies a failed request. Overload and connection errors are
+    retryable; errors reported by the API (e.g. HTTP 400/403/404) are
+    permanent and would fail again.
+    """
+    if isinstance(error, ApiError):
+        return error.status in RETRYABLE_STATUSES
+    return True
+
+
+class ErrorBudget:
+    """
+    Decides when a run has failed too often to continue.
+
+    The budget is exhausted after 'max_errors' failed devices, or when more
+    than 'max_error_rate' of the attempted devices failed. The rate is only
+    judged after MIN_SAMPLE devices, so one early failure cannot abort a
+    run. Each device counts once, however often it is retried. It is also
+    exhausted when the run 'deadline' passes. Devices that were not
+    attempted are reported as skipped.
+    """
+
+    MIN_SAMPLE = 20
+
+    def __init__(self, max_errors=None, max_error_rate=None, deadline=None):
+        self.max_errors = max_errors
+        self.max_error_rate = max_error_rate
+        self.deadline = deadline
+        self.attempts = 0
+        self.errors = 0
+        self._attempted = set()
+        self._failed = set()
+        self._exhausted = False
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self):
+        if not self._exhausted and self.deadline is not None and self.deadline.expired:
+            with self._lock:
+                if not self._exhausted:
+                    self._exhausted = True
+                    logger.error(f"Run deadline of {self.deadline.seconds} s reached. Aborting, the remaining devices are skipped.")
+        return self._exhausted
+
+    def add(self, outcome):
+        guid = outcome["guid"]
+        with self._lock:
+            if guid not in self._attempted:
+                self._attempted.add(guid)
+                self.attempts += 1
+            if "error" not in outcome or guid in self._failed:
+                return
+            self._failed.add(guid)
+            self.errors += 1
+            if self._exhausted:
+                return
+            if self.max_errors is not None and self.errors >= self.max_errors:
+                reason = f"{self.errors} failed devices (--max_errors {self.max_errors})"
+            elif (
+                self.max_error_rate is not None and self.attempts >= self.MIN_SAMPLE
+                and self.errors / self.attempts > self.max_error_rate
+            ):
+                reason = f"{self.errors} of {self.attempts} devices failed (--max_error_rate {self.max_error_rate})"
+            else:
+                return
+            self._exhausted = True
+            logger.error(f"Error budget exhausted: {reason}. Aborting, the remaining devices are skipped.")
+
+
+def endpoint_action(method, path):
+    """Names the endpoint of an API request: "list", "disable", "enable", "assign" or "delete"."""
+    if method == "GET":
+        return "list"
+    if method == "DELETE":
+        return "delete"
+    return path.rsplit("/", 1)[-1]
+
+
+def retry_after(value):
+    """Returns the delay in seconds requested by a Retry-After header (seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class Backoff:
+    """
+    Delays between the retries of one request: exponential backoff with
+    decorrelated jitter. Each delay is drawn between 'base' and three times
+    the previous delay, capped at 'cap', so retries of many workers spread
+    out instead of hitting a recovering server at the same moment. A
+    Retry-After from the server takes precedence (also capped at 'cap').
+    """
+
+    def __init__(self, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+        self.base = base
+        self.cap = cap
+        self.delay = base
+
+    def next(self, requested=None):
+        if requested is not None:
+            return min(self.cap, requested + random.uniform(0, self.base))
+        self.delay = min(self.cap, random.uniform(self.base, self.delay * 3))
+        return self.delay
+
+
+class HedgePolicy:
+    """
+    Decides when a slow device list page is requested a second time
+    ("hedged"). A page that has not arrived within the p95 of the last
+    WINDOW page latencies is sent again and the first answer wins, which
+    cuts the tail of the scan on a lossy link. Hedging starts after
+    MIN_SAMPLE pages, and at most MAX_SHARE of the pages are hedged so a
+    slow server is not flooded with duplicates.
+    """
+
+    WINDOW = 200
+    MIN_SAMPLE = 20
+    MAX_SHARE = 0.1
+
+    def __init__(self):
+        self.latencies = deque(maxlen=self.WINDOW)
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Returns the seconds to wait before hedging the next page, or None to not hedge it."""
+        with self._lock:
+            self.requests += 1
+            if len(self.latencies) < self.MIN_SAMPLE or self.hedges >= self.requests * self.MAX_SHARE:
+                return None
+            latencies = sorted(self.latencies)
+        return latencies[int(len(latencies) * 0.95)]
+
+    def record(self, latency, hedged=False):
+        """Records the time until a page arrived and whether a duplicate was sent."""
+        with self._lock:
+            self.latencies.append(latency)
+            self.hedges += hedged
+        if hedged:
+            STATS.add("hedged")
+
+
+def retry_limits(max_retries=None):
+    """Returns the retries per endpoint; 'max_retries' replaces the MAX_RETRIES of all endpoints."""
+    if max_retries is None:
+        return dict(MAX_RETRIES)
+    return dict.fromkeys(MAX_RETRIES, max_retries)
+
+
+def rate_limits(max_rps=None, max_read_rps=None, max_write_rps=None):
+    """
+    Returns the token buckets for the read path (GET /api/devices) and the
+    write paths (disable, enable, delete, assign). 'max_rps' is one bucket
+    shared by both paths, so it caps the total load; the read and write
+    budgets are further limits within it. A budget of None means unlimited.
+    """
+    shared = [TokenBucket(max_rps)] if max_rps else []
+    return {
+        "read": shared + ([TokenBucket(max_read_rps)] if max_read_rps else []),
+        "write": shared + ([TokenBucket(max_write_rps)] if max_write_rps else []),
+    }
+
+
+def rate_limit_delay(limits, kind):
+    """Takes a token from every bucket limiting 'kind' and returns the longest wait in seconds."""
+    return max((bucket.reserve() for bucket in limits.get(kind, ())), default=0.0)
+
+
+class RunStats:
+    """
+    Timing surface for one run.
+
+    Records the wall time spent in the scan, filter and action phases,
+    counters such as pages fetched and devices scanned or matched, and,
+    per API endpoint, the number of requests, failed requests, body bytes
+    sent and received, and a latency histogram. In streaming mode the
+    phases overlap, so their times can add up to more than the run took.
+    """
+
+    # Upper bounds of the latency histogram buckets in seconds (the last bucket is open)
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.phases = {}
+        self.counters = {}
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Starts a new run, e.g. for every scheduled run of the daemon."""
+        with self._lock:
+            self.started = time.monotonic()
+            self.phases = {}
+            self.counters = {}
+            self.endpoints = {}
+
+    def add(self, name, amount=1):
+        """Adds 'amount' to counter 'name', e.g. "pages", "scanned" or "matched"."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def phase(self, name):
+        """Adds the wall time of the 'with' block to phase 'name'."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def _endpoint(self, method, path):
+        """Returns the statistics of an endpoint; call with the lock held."""
+        parts = path.split("/")
+        if len(parts) > 3:
+            # /api/devices/{guid}[/action]: one endpoint for all devices
+            parts[3] = "{guid}"
+        name = f"{method} {'/'.join(parts)}"
+        stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints[name] = {
+                "requests": 0, "errors": 0, "retries": 0, "backoff_seconds": 0.0, "bytes_sent": 0,
+                "bytes_received": 0, "seconds": 0.0, "histogram": [0] * (len(self.LATENCY_BUCKETS) + 1),
+            }
+        return stats
+
+    def retry(self, method, path, delay):
+        """Records that a request is retried after backing off for 'delay' seconds."""
+        with self._lock:
+            stats = self._endpoint(method, path)
+            stats["retries"] += 1
+            stats["backoff_seconds"] += delay
+
+    def record(self, method, path, latency, status, sent=0, received=0):
+        """Records one request ('status' is None for connection errors)."""
+        with self._lock:
+            stats = self._endpoint(method, path)
+            stats["requests"] += 1
+            stats["errors"] += status != 200
+            stats["bytes_sent"] += sent
+            stats["bytes_received"] += received
+            stats["seconds"] += latency
+            stats["histogram"][bisect.bisect_left(self.LATENCY_BUCKETS, latency)] += 1
+
+    def percentile(self, histogram, fraction):
+        """Returns the upper bound in ms of the bucket holding the 'fraction' percentile (None if open)."""
+        rank = fraction * sum(histogram)
+        for bound, count in zip(self.LATENCY_BUCKETS, histogram):
+            rank -= count
+            if rank <= 0:
+                return bound * 1000
+        return None
+
+    def as_dict(self):
+        labels = [f"<={bound * 1000:g}ms" for bound in self.LATENCY_BUCKETS] + [f">{self.LATENCY_BUCKETS[-1] * 1000:g}ms"]
+        with self._lock:
+            endpoints = {}
+            for name, stats in self.endpoints.items():
+                endpoints[name] = {
+                    key: stats[key] for key in ("requests", "errors", "retries", "bytes_sent", "bytes_received")
+                }
+                endpoints[name]["backoff_seconds"] = round(stats["backoff_seconds"], 3)
+                endpoints[name]["mean_ms"] = round(stats["seconds"] / max(1, stats["requests"]) * 1000, 2)
+                for label, fraction in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+                    endpoints[name][label] = self.percentile(stats["histogram"], fraction)
+                endpoints[name]["histogram"] = dict(zip(labels, stats["histogram"]))
+            return {
+                "wall_seconds": round(time.monotonic() - self.started, 3),
+                "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+                "counters": dict(self.counters),
+                "endpoints": endpoints,
+            }
+
+    def log(self, logger):
+        """Logs where the time of the run went: per phase and per endpoint."""
+        stats = self.as_dict()
+        phases = ", ".join(f"{name}: {seconds:.2f} s" for name, seconds in stats["phases"].items()) or "no phases"
+        logger.info(f"Timing: {stats['wall_seconds']:.2f} s in total - {phases}")
+        if stats["counters"]:
+            logger.info("Counters: " + ", ".join(f"{name}: {value}" for name, value in stats["counters"].items()))
+        for name, endpoint in stats["endpoints"].items():
+            percentiles = []
+            for label in ("p50", "p95", "p99"):
+                value = endpoint[f"{label}_ms"]
+                if value is None:
+                    percentiles.append(f"{label} > {self.LATENCY_BUCKETS[-1] * 1000:g} ms")
+                else:
+                    percentiles.append(f"{label} <= {value:g} ms")
+            logger.info(
+                f"Requests {name}: {endpoint['requests']} (errors: {endpoint['errors']}, "
+                f"retries: {endpoint['retries']} after {endpoint['backoff_seconds']:.1f} s backoff), "
+                f"{endpoint['bytes_sent'] / 1024:.1f} KiB sent, {endpoint['bytes_received'] / 1024:.1f} KiB received, "
+                f"mean {endpoint['mean_ms']:.1f} ms, {', '.join(percentiles)}"
+            )
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def write_prometheus(self, path, command, success):
+        """
+        Writes the run as Prometheus metrics for node_exporter's textfile
+        collector. The file is written next to 'path' and then renamed, so
+        the collector never reads a half-written file.
+        """
+        labels = f'command="{command}"'
+        with self._lock:
+            counters = dict(self.counters)
+            phases = dict(self.phases)
+            endpoints = {name: dict(stats) for name, stats in self.endpoints.items()}
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append(f"# HELP rustdesk_cleaner_{name} {help}")
+            lines.append(f"# TYPE rustdesk_cleaner_{name} {kind}")
+            for suffix, extra, value in samples:
+                value = value if isinstance(value, int) else f"{value:.6f}"
+                lines.append(f"rustdesk_cleaner_{name}{suffix}{{{labels}{extra}}} {value}")
+
+        metric("last_run_timestamp_seconds", "gauge", "Unix time the last run finished.", [("", "", time.time())])
+        metric("last_run_success", "gauge", "1 if the last run completed without failed devices.", [("", "", int(success))])
+        metric("run_duration_seconds", "gauge", "Wall time of the last run.", [("", "", time.monotonic() - self.started)])
+        metric("phase_duration_seconds", "gauge", "Wall time per phase of the last run.", [
+            ("", f',phase="{name}"', seconds) for name, seconds in phases.items()
+        ])
+        metric("pages_fetched", "gauge", "Device list pages fetched.", [("", "", counters.get("pages", 0))])
+        metric("pages_hedged", "gauge", "Device list pages requested a second time because they were slow.", [
+            ("", "", counters.get("hedged", 0))
+        ])
+        metric("devices_scanned", "gauge", "Devices read from the server.", [("", "", counters.get("scanned", 0))])
+        metric("devices_matched", "gauge", "Devices matching the filters.", [("", "", counters.get("matched", 0))])
+        metric("devices_processed", "gauge", "Devices that completed each step.", [
+            ("", f',step="{step}"', counters.get(step, 0)) for step in ("disable", "enable", "delete", "assign")
+        ])
+        metric("devices_failed", "gauge", "Devices with a failed request.", [("", "", counters.get("failed", 0))])
+        metric("requests", "gauge", "API requests per endpoint.", [
+            ("", f',endpoint="{name}"', stats["requests"]) for name, stats in endpoints.items()
+        ])
+        metric("request_errors", "gauge", "Failed API requests per endpoint.", [
+            ("", f',endpoint="{name}"', stats["errors"]) for name, stats in endpoints.items()
+        ])
+        metric("request_retries", "gauge", "Retried API requests per endpoint.", [
+            ("", f',endpoint="{name}"', stats["retries"]) for name, stats in endpoints.items()
+        ])
+        metric("request_backoff_seconds", "gauge", "Time spent backing off before retries per endpoint.", [
+            ("", f',endpoint="{name}"', stats["backoff_seconds"]) for name, stats in endpoints.items()
+        ])
+        metric("request_bytes", "gauge", "Request and response body bytes per endpoint.", [
+            ("", f',endpoint="{name}",direction="{direction}"', stats[f"bytes_{direction}"])
+            for name, stats in endpoints.items() for direction in ("sent", "received")
+        ])
+        samples = []
+        for name, stats in endpoints.items():
+            cumulative = 0
+            for bound, count in zip(self.LATENCY_BUCKETS + (float("inf"),), stats["histogram"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                samples.append(("_bucket", f',endpoint="{name}",le="{le}"', cumulative))
+            samples.append(("_sum", f',endpoint="{name}"', stats["seconds"]))
+            samples.append(("_count", f',endpoint="{name}"', stats["requests"]))
+        metric("request_duration_seconds", "histogram", "API request latency per endpoint.", samples)
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temporary, path)
+
+
+STATS = RunStats()
+
+
+class RustDeskClient:
+    """
+    Shared connection to the RustDesk API server.
+
+    All API calls go through one pooled 'requests.Session', so TCP and TLS
+    connections are reused (keep-alive) instead of being opened per request.
+    The pool should be at least as large as the number of worker threads.
+
+    If a ConcurrencyController is given, workers wait until the controller
+    allows another request to be in flight. 'limits' maps "read"/"write" to
+    the TokenBuckets that cap the request rate of that path (rate_limits).
+
+    Requests failing with a status in RETRYABLE_STATUSES or a connection
+    error are retried with Backoff, up to 'retries[endpoint]' times (see
+    endpoint_action). All API calls are idempotent, so this is safe for
+    writes too. A DELETE answered with 404 after an earlier attempt failed
+    ambiguously has already succeeded; the response is marked 'already_done'.
+
+    Every request is bounded by 'timeout' (connect, read) and by the run
+    'deadline'. With a HedgePolicy, get_page() sends a duplicate of slow
+    device list pages.
+    """
+
+    def __init__(
+        self, url, token, pool_size=FETCH_WORKERS, controller=None, limits=None, retries=None,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), deadline=None, hedge=None,
+    ):
+        self.url = url
+        self.controller = controller
+        self.limits = limits or {}
+        self.retries = MAX_RETRIES if retries is None else retries
+        self.timeout = timeout
+        self.deadline = deadline or Deadline()
+        self.hedge = hedge
+        self._in_flight = 0
+        self._slot = threading.Condition()
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {token}"})
+        # Hedged pages may need a second connection per worker
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=max(1, pool_size) * (2 if hedge else 1)
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=max(1, pool_size) * 2) if hedge else None
+
+    def request(self, method, path, **kwargs):
+        retries = self.retries.get(endpoint_action(method, path), 0)
+        backoff = Backoff()
+        for attempt in range(retries + 1):
+            error = None
+            try:
+                response = self._send(method, path, **kwargs)
+            except requests.RequestException as e:
+                error = e
+                reason = str(e)
+                delay = backoff.next()
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    response.already_done = attempt > 0 and method == "DELETE" and response.status_code == 404
+                    return response
+                reason = f"HTTP {response.status_code}"
+                delay = backoff.next(retry_after(response.headers.get("Retry-After")))
+            remaining = self.deadline.remaining()
+            if attempt == retries or (remaining is not None and remaining < delay):
+                if error is not None:
+                    # A timeout shortened by the run deadline is reported as such
+                    self.deadline.check()
+                    raise error
+                response.already_done = False
+                return response
+            logger.warning(f"{method} {path} failed ({reason}), retry {attempt + 1} of {retries} in {delay:.1f} s")
+            STATS.retry(method, path, delay)
+            time.sleep(delay)
+
+    def get_page(self, path, **kwargs):
+        """
+        GET request for a device list page. With a HedgePolicy, a duplicate
+        is sent if the page is slower than the recent p95, and whichever
+        answers first is returned.
+        """
+        if self.hedge is None:
+            return self.request("GET", path, **kwargs)
+        start = time.monotonic()
+        delay = self.hedge.delay()
+        if delay is None:
+            response = self.request("GET", path, **kwargs)
+            self.hedge.record(time.monotonic() - start)
+            return response
+        futures = [self._hedge_pool.submit(self.request, "GET", path, **kwargs)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            logger.debug(f"GET {path} slower than {delay * 1000:.0f} ms, sending a hedged request")
+            futures.append(self._hedge_pool.submit(self.request, "GET", path, **kwargs))
+        while True:
+            done, pending = wait(futures, return_when=FIRST_COMPLETED)
+            # Take the first answer; a failed request only counts if the other one failed too
+            answers = [future for future in done if future.exception() is None]
+            if answers or not pending:
+                self.hedge.record(time.monotonic() - start, hedged=len(futures) > 1)
+                return (answers or list(done))[0].result()
+            futures = list(pending)
+
+    def _send(self, method, path, **kwargs):
+        """Sends one request, honoring the rate limits and the concurrency controller."""
+        kwargs["timeout"] = self.deadline.timeout(*self.timeout)
+        kind = "read" if method == "GET" else "write"
+        delay = rate_limit_delay(self.limits, kind)
+        if delay:
+            time.sleep(delay)
+        if self.controller is not None:
+            with self._slot:
+                while self._in_flight >= self.controller.slots():
+                    self._slot.wait()
+                self._in_flight += 1
+        start = time.monotonic()
+        response = None
+        try:
+            response = self.session.request(method, f"{self.url}{path}", **kwargs)
+            return response
+        finally:
+            latency = time.monotonic() - start
+            status = response.status_code if response is not None else None
+            if response is not None:
+                sent = len(response.request.body or b"")
+                STATS.record(method, path, latency, status, sent, len(response.content))
+            else:
+                STATS.record(method, path, latency, status)
+            if self.controller is not None:
+                self.controller.record(kind, latency, status)
+                with self._slot:
+                    self._in_flight -= 1
+                    self._slot.notify_all()
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def fetch_page(client, params, current):
+    """
+    Fetches a single page of the device list and returns the decoded JSON.
+
+    Transient failures are retried by the client. If the page still cannot
+    be read, ApiError or the connection error is raised: acting on an
+    incomplete list is not safe.
+    """
+    params = dict(params, current=current)
+    response_json = check(client.get_page("/api/devices", params=params))
+    if not isinstance(response_json, dict):
+        raise ApiError(f"Unexpected response: {str(response_json)[:200]}")
+    STATS.add("pages")
+    STATS.add("scanned", len(response_json.get("data", [])))
+    return response_json
+
+
+def capped_page_size(first, page_size, params):
+    """
+    Returns the (page_size, params) to read the remaining pages with.
+
+    A server that limits the page size returns a short first page although
+    more devices exist. Without noticing, the scan would stop after it, so
+    the remaining pages are requested at the size the server delivered.
+    """
+    count = len(first.get("data", []))
+    if 0 < count < page_size and count < first.get("total", 0):
+        logger.warning(f"The server caps device list pages at {count} devices (requested {page_size}), continuing with {count}")
+        return count, dict(params, pageSize=str(count))
+    return page_size, params
+
+
+def probe_page_size(client, logger):
+    """
+    Requests the first device list page at each size in PAGE_SIZE_PROBES
+    and returns the size with the lowest latency per device.
+
+    Probing stops at the first size that the server rejects or caps (it
+    returns fewer devices than requested although more exist), that holds
+    the whole list, or that no longer saves at least 10% per device. Once a
+    size worked, a larger one that still fails after the client's retries
+    (HTTP 5xx, timeout) also ends probing, keeping the best size so far.
+    """
+    # Open the connection first, so the handshake does not count against the smallest size
+    client.get("/api/devices", params={"pageSize": 1, "current": 1})
+    best, best_cost = PAGE_SIZE_PROBES[0], None
+    for size in PAGE_SIZE_PROBES:
+        start = time.monotonic()
+        try:
+            page = check(client.get("/api/devices", params={"pageSize": size, "current": 1}))
+        except (ApiError, requests.RequestException) as e:
+            if best_cost is None:
+                raise
+            if getattr(e, "status", None) is not None and 400 <= e.status < 500:
+                logger.info(f"Page size {size} rejected by the server ({e})")
+            else:
+                logger.warning(f"Page size {size} failed, keeping {best} ({type(e).__name__} {e})")
+            break
+        latency = time.monotonic() - start
+        count = len(page.get("data", []))
+        if not count:
+            break
+        cost = latency / count
+        logger.info(f"Page size {size}: {count} devices in {latency * 1000:.0f} ms ({cost * 1e6:.0f} us per device)")
+        if best_cost is not None and cost > best_cost * 0.9:
+            break
+        best, best_cost = min(size, count), cost
+        if count < size:
+            # Either the whole list fits into this page or the server caps the size
+            if count < page.get("total", 0):
+                logger.info(f"The server caps device list pages at {count} devices")
+            else:
+                best = size
+            break
+    return best
+
+
+def auto_page_size(client, args, snapshot, logger):
+    """
+    Resolves '--page_size auto' to a number of devices per page.
+
+    The size found by probe_page_size() is saved in the inventory snapshot
+    (per server URL) and reused for PAGE_SIZE_TTL seconds.
+    """
+    key = f"page_size {args.url}"
+    saved = snapshot.setting(key) if snapshot is not None else None
+    if saved is not None and time.time() - saved["probed_at"] < PAGE_SIZE_TTL:
+        logger.info(f"Using page size {saved['size']}, probed {datetime.fromtimestamp(saved['probed_at'])}")
+        return saved["size"]
+    size = probe_page_size(client, logger)
+    logger.info(f"Selected page size {size}")
+    if snapshot is not None:
+        snapshot.save_setting(key, {"size": size, "probed_at": time.time()})
+    return size
+
+
+def fetch_pages(client, params, page_size, workers=FETCH_WORKERS, reverse=False):
+    """
+    Yields the device list pages in page order.
+
+    The first page is fetched on its own to learn the 'total' reported by the
+    server. The remaining pages are then fetched by up to 'workers' threads,
+    keeping a bounded window of requests in flight.
+
+    With 'reverse', the pages are yielded from the last page back to the
+    first. Deleting devices while the list is being read only shifts the
+    pages after them, so reading backwards never skips a device.
+    """
+    with STATS.phase("scan"):
+        first = fetch_page(client, params, 1)
+    if not reverse:
+        yield first
+
+    total = first.get("total", 0)
+    page_size, params = capped_page_size(first, page_size, params)
+    if len(first.get("data", [])) < page_size or page_size >= total:
+        if reverse:
+            yield first
+        return
+    last_page = -(-total // page_size)
+    pages = range(last_page, 1, -1) if reverse else range(2, last_page + 1)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = deque()
+        remaining = iter(pages)
+        while True:
+            # Keep the window full so workers never idle while pages are consumed
+            for current in remaining:
+                pending.append(executor.submit(fetch_page, client, params, current))
+                if len(pending) >= max(1, workers) * 2:
+                    break
+            if not pending:
+                break
+            with STATS.phase("scan"):
+                page = pending.popleft().result()
+            yield page
+            # A short page means the list shrank while we were reading it
+            if not reverse and len(page.get("data", [])) < page_size:
+                for future in pending:
+                    future.cancel()
+                return
+
+    if reverse:
+        yield first
+
+
+class SymbolTable:
+    """
+    Shared table for low-cardinality strings such as group, user and
+    strategy names.
+
+    Every decoded JSON string is a new object, so 100k devices in the same
+    group hold 100k copies of the group name. Interning maps equal values
+    to one shared object. With 'track' enabled, per-field statistics are
+    collected for --mem_report.
+    """
+
+    def __init__(self):
+        self.symbols = {}
+        self.track = False
+        self.stats = {}
+
+    def intern(self, field, value):
+        if not isinstance(value, str):
+            return value
+        symbol = self.symbols.setdefault(value, value)
+        if self.track:
+            stats = self.stats.setdefault(field, {"values": 0, "bytes": 0, "unique": set()})
+            stats["values"] += 1
+            stats["bytes"] += sys.getsizeof(value)
+            stats["unique"].add(symbol)
+        return symbol
+
+    def log_report(self, logger):
+        """Logs, per interned field, the string memory with and without interning."""
+        for field, stats in self.stats.items():
+            interned = sum(sys.getsizeof(value) for value in stats["unique"])
+            logger.info(
+                f"Memory report for {field}: {stats['values']} values, {len(stats['unique'])} unique, "
+                f"{stats['bytes'] / 1024:.1f} KiB as decoded -> {interned / 1024:.1f} KiB interned"
+            )
+
+
+# Low-cardinality device fields stored through the shared symbol table
+INTERNED_FIELDS = ("device_group_name", "user_name", "strategy_name")
+SYMBOLS = SymbolTable()
+# --fields value that keeps every field of the server record ('view' without --fields)
+ALL_FIELDS = ("*",)
+
+
+class Device:
+    """
+    Compact record of one device.
+
+    Only the fields the cleaner works with are kept; the rest of the API
+    response is dropped when the page is parsed. Additional fields can be
+    requested with --fields (ALL_FIELDS for the whole record) and are
+    stored in 'extra'. Group, user and strategy names are interned through
+    SYMBOLS.
+    """
+
+    __slots__ = ("guid", "id", "last_online", "device_group_name", "extra")
+
+    def __init__(self, guid, id, last_online=None, device_group_name=None, extra=None):
+        self.guid = guid
+        self.id = id
+        self.last_online = last_online
+        self.device_group_name = device_group_name
+        self.extra = extra
+
+    @classmethod
+    def from_json(cls, data, fields=()):
+        extra = None
+        if fields == ALL_FIELDS:
+            fields = [field for field in data if field not in cls.__slots__]
+        if fields:
+            extra = {
+                field: SYMBOLS.intern(field, data.get(field)) if field in INTERNED_FIELDS else data.get(field)
+                for field in fields
+            }
+        return cls(
+            data["guid"],
+            data.get("id"),
+            data.get("last_online"),
+            SYMBOLS.intern("device_group_name", data.get("device_group_name")),
+            extra,
+        )
+
+    def as_dict(self):
+        result = {
+            "guid": self.guid,
+            "id": self.id,
+            "last_online": self.last_online,
+            "device_group_name": self.device_group_name,
+        }
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+
+class ColumnarInventory:
+    """
+    Column-oriented device inventory for very large fleets (--columnar).
+
+    Instead of one object per device, the inventory is held in arrays:
+    last_online as int64 epoch seconds, the device group as an index into a
+    dictionary of group names, and a flags bitmap per device. The local
+    filters then run as vectorized mask operations with NumPy if it is
+    installed, or as a tight loop over the 'array' columns otherwise.
+    """
+
+    HAS_LAST_ONLINE = 1
+    UNGROUPED = 2
+    NEVER = 2 ** 63 - 1
+
+    def __init__(self, fields=()):
+        self.guids = []
+        self.ids = []
+        self.last_online_text = []
+        self.last_online = array("q")
+        self.group_codes = array("i")
+        self.flags = array("B")
+        self.group_names = [""]
+        self._group_lookup = {"": 0}
+        self._day_epochs = {}
+        # With ALL_FIELDS, the fields of each record are kept in 'records' instead
+        self.all_fields = fields == ALL_FIELDS
+        self.records = []
+        self.extra = {} if self.all_fields else {field: [] for field in fields}
+
+    def __len__(self):
+        return len(self.guids)
+
+    def epochs(self, texts):
+        """
+        Converts the 'last_online' values of one page to whole epoch seconds.
+
+        With NumPy, the page is parsed in one datetime64 conversion. Otherwise,
+        or if NumPy rejects a value, values in the API's fixed layout take the
+        fast path of OfflineCutoff.matches(): the date part is converted once
+        per distinct day and the time of day is added. Anything else goes
+        through last_online_epoch(). Missing or invalid values become NEVER.
+        """
+        if numpy is not None and set(map(type, texts)) <= {str}:
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")  # UTC offsets are converted, with a warning
+                    parsed = numpy.array(texts, dtype="datetime64[s]")
+                values = parsed.astype(numpy.int64)
+                values[numpy.isnat(parsed)] = self.NEVER
+                return values.tolist()
+            except ValueError:
+                pass
+
+        day_epochs = self._day_epochs
+        epochs = []
+        for text in texts:
+            epoch = self.NEVER
+            if text:
+                try:
+                    tail = text[19:]
+                    if text[10:11] == "T" and len(text) >= 19 and (not tail or (tail[0] == "." and tail[1:].isdigit())):
+                        day = day_epochs.get(text[:10])
+                        if day is None:
+                            day = day_epochs[text[:10]] = int(last_online_epoch(text[:10] + "T00:00:00"))
+                        epoch = day + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+                    else:
+                        epoch = int(last_online_epoch(text))
+                except (TypeError, ValueError):
+                    pass
+            epochs.append(epoch)
+        return epochs
+
+    def add_page(self, data):
+        """Appends the devices of one API page to the columns."""
+        texts = [device.get("last_online") for device in data]
+        epochs = self.epochs(texts)
+        group_lookup = self._group_lookup
+        codes = []
+        flags = []
+        for device, epoch in zip(data, epochs):
+            group = device.get("device_group_name") or ""
+            code = group_lookup.get(group)
+            if code is None:
+                code = group_lookup[group] = len(self.group_names)
+                self.group_names.append(group)
+            codes.append(code)
+            flags.append((0 if epoch == self.NEVER else self.HAS_LAST_ONLINE) | (0 if group else self.UNGROUPED))
+
+        self.guids.extend([device["guid"] for device in data])
+        self.ids.extend([device.get("id") for device in data])
+        self.last_online_text.extend(texts)
+        self.last_online.extend(epochs)
+        self.group_codes.extend(codes)
+        self.flags.extend(flags)
+        for field, column in self.extra.items():
+            column.extend([device.get(field) for device in data])
+        if self.all_fields:
+            self.records.extend([Device.from_json(device, ALL_FIELDS).extra for device in data])
+
+    def matching_rows(self, cutoff=None, no_group=False):
+        """Returns the row numbers matching the local filters, in server order."""
+        if not len(self):
+            return []
+        if numpy is not None:
+            flags = numpy.frombuffer(self.flags, dtype=numpy.uint8)
+            mask = numpy.ones(len(self), dtype=bool)
+            if cutoff is not None:
+                last_online = numpy.frombuffer(self.last_online, dtype=numpy.int64)
+                mask &= (flags & self.HAS_LAST_ONLINE).astype(bool)
+                mask &= last_online <= cutoff.epoch
+            if no_group:
+                mask &= (flags & self.UNGROUPED).astype(bool)
+            return numpy.flatnonzero(mask).tolist()
+
+        required = (self.HAS_LAST_ONLINE if cutoff is not None else 0) | (self.UNGROUPED if no_group else 0)
+        limit = cutoff.epoch if cutoff is not None else self.NEVER
+        return [
+            row
+            for row, (flags, last_online) in enumerate(zip(self.flags, self.last_online))
+            if flags & required == required and last_online <= limit
+        ]
+
+    def select(self, cutoff=None, no_group=False):
+        """Returns the matching devices as Device records."""
+        return [
+            Device(
+                self.guids[row],
+                self.ids[row],
+                self.last_online_text[row],
+                self.group_names[self.group_codes[row]],
+                self.records[row] if self.all_fields else {field: column[row] for field, column in self.extra.items()} or None,
+            )
+            for row in self.matching_rows(cutoff, no_group)
+        ]
+
+
+def build_params(id=None, device_name=None, user_name=None, group_name=None, device_group_name=None):
+    """Builds the server-side search parameters for /api/devices."""
+    params = {
+        "id": id,
+        "device_name": device_name,
+        "user_name": user_name,
+        "group_name": group_name,
+        "device_group_name": device_group_name,
+    }
+
+    # Add wildcards to search parameters if not already present
+    return {
+        k: "%" + v + "%" if (v != "-" and "%" not in v) else v
+        for k, v in params.items()
+        if v is not None
+    }
+
+
+def has_search_filters(args):
+    """Returns True if search filters are active that the server applies (--id, --device_name, ...)."""
+    return bool(build_params(args.id, args.device_name, args.user_name, args.group_name, args.device_group_name))
+
+
+def has_local_filters(args):
+    """
+    Returns True if 'view --count' has to apply filters locally.
+
+    --offline_days is always local. --no_group can be sent to the server as
+    device_group_name "-" (the API's pattern for an empty field), unless
+    --device_group_name is given as well.
+    """
+    return args.offline_days is not None or (args.no_group and args.device_group_name is not None)
+
+
+def filter_devices(data, cutoff=None, no_group=False):
+    """
+    Applies the local filters to one page of devices.
+
+    'cutoff' is the OfflineCutoff for --offline_days (None = no filter), so
+    the current time is only evaluated once per run.
+    """
+    for device in data:
+        # 1. Filter by offline duration
+        if cutoff is not None:
+            last_online_str = device.get("last_online")
+            if not last_online_str or not cutoff.matches(last_online_str):
+                continue
+        
+        # 2. Filter by group membership
+        if no_group:
+            # If a group name is present, the device is not 'ungrouped'
+            if device.get("device_group_name"):
+                continue
+        
+        yield device
+
+
+TIMESTAMP_PATTERN = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:?\d{2})?$"
+)
+
+
+def last_online_epoch(last_online_str):
+    """
+    Converts a 'last_online' value (e.g. 2024-01-31T10:00:00.123456) to epoch seconds.
+
+    Values without a UTC offset are UTC, as returned by the RustDesk API.
+    datetime.fromisoformat() (implemented in C) handles the common formats;
+    the regular expression covers what older Python versions reject, such
+    as 'Z' or fractional seconds that are not 3 or 6 digits long.
+    """
+    try:
+        last_online = datetime.fromisoformat(last_online_str)
+    except ValueError:
+        match = TIMESTAMP_PATTERN.match(last_online_str.strip())
+        if match is None:
+            raise
+        year, month, day, hour, minute, second, fraction, offset = match.groups()
+        last_online = datetime(
+            int(year), int(month), int(day), int(hour), int(minute), int(second),
+            int((fraction or "0")[:6].ljust(6, "0")), timezone.utc,
+        )
+        if offset and offset != "Z":
+            sign = -1 if offset[0] == "-" else 1
+            digits = offset[1:].replace(":", "")
+            last_online -= sign * timedelta(hours=int(digits[:2]), minutes=int(digits[2:]))
+    if last_online.tzinfo is None:
+        last_online = last_online.replace(tzinfo=timezone.utc)
+    return last_online.timestamp()
+
+
+class OfflineCutoff:
+    """
+    The --offline_days filter, evaluated against one cutoff per run.
+
+    A device matches if it was last online at or before 'now - offline_days'.
+    The API returns naive UTC timestamps with a fixed layout, which compare
+    correctly as strings, so the common case needs no parsing at all.
+    Anything else (offsets, 'Z', other layouts) goes through last_online_epoch().
+    """
+
+    def __init__(self, offline_days, now=None):
+        self.epoch = (time.time() if now is None else now) - offline_days * 86400
+        self.text = datetime.fromtimestamp(self.epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+    def matches(self, last_online_str):
+        # Fast path: 'YYYY-MM-DDTHH:MM:SS' optionally followed by '.<digits>'
+        tail = last_online_str[19:]
+        if len(last_online_str) >= 19 and last_online_str[10] == "T" and (
+            not tail or (tail[0] == "." and tail[1:].isdigit())
+        ):
+            return last_online_str[:19] <= self.text
+        try:
+            return last_online_epoch(last_online_str) <= self.epoch
+        except ValueError:
+            return False
+
+
+def offline_cutoff(offline_days):
+    """Returns the OfflineCutoff for --offline_days, or None if the filter is disabled."""
+    return OfflineCutoff(offline_days) if offline_days is not None else None
+
+
+class InventoryCache:
+    """
+    On-disk SQLite snapshot of the full (unfiltered) device inventory.
+
+    The snapshot is replaced by a full scan when it is older than the TTL.
+    The CLI filters run as queries against indexed columns, so repeated
+    'view' commands do not have to download the device list again.
+
+    A snapshot belongs to the server 'url' it was opened for; opened for
+    another server, its devices and settings are discarded.
+    """
+
+    SCHEMA_VERSION = 3
+
+    def __init__(self, path, url=None):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            # Snapshots are disposable, so an older layout is simply rebuilt
+            self.db.executescript("DROP TABLE IF EXISTS devices; DROP TABLE IF EXISTS meta; DROP TABLE IF EXISTS devices_search;")
+        # NOCASE columns let SQLite use the indexes for exact and LIKE 'prefix%' patterns
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS devices (
+                guid TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                id TEXT COLLATE NOCASE,
+                device_name TEXT COLLATE NOCASE,
+                user_name TEXT COLLATE NOCASE,
+                device_group_name TEXT COLLATE NOCASE,
+                last_online REAL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_devices_id ON devices (id);
+            CREATE INDEX IF NOT EXISTS idx_devices_name ON devices (device_name);
+            CREATE INDEX IF NOT EXISTS idx_devices_user ON devices (user_name);
+            CREATE INDEX IF NOT EXISTS idx_devices_group ON devices (device_group_name);
+            CREATE INDEX IF NOT EXISTS idx_devices_last_online ON devices (last_online);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            PRAGMA user_version = {self.SCHEMA_VERSION};
+        """)
+        self.search = self._create_search_index()
+        if url is not None:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'url'").fetchone()
+            with self.db:
+                if row is not None and row[0] != url:
+                    logger.warning(f"Inventory snapshot {path} belongs to {row[0]}, discarding it for {url}")
+                    self.db.execute("DELETE FROM devices")
+                    self.db.execute("DELETE FROM meta")
+                    self._reindex()
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('url', ?)", (url,))
+
+    def _create_search_index(self):
+        """
+        Creates the trigram index for '%value%' patterns (see query()).
+        Returns False if the SQLite library has no FTS5 trigram tokenizer
+        (SQLite < 3.34); such patterns then scan the table.
+        """
+        try:
+            self.db.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS devices_search USING fts5(
+                    id, device_name, user_name, device_group_name, content='devices', tokenize='trigram'
+                )
+            """)
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def _reindex(self):
+        """Rebuilds the trigram index from the devices table, far faster than per-row updates."""
+        if self.search:
+            self.db.execute("INSERT INTO devices_search (devices_search) VALUES ('rebuild')")
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM devices").fetchone()[0]
+
+    def age(self):
+        """Returns the age of the snapshot in seconds (None if there is none)."""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'fetched_at'").fetchone()
+        if row is None or not float(row[0]):
+            return None
+        return time.time() - float(row[0])
+
+    def setting(self, key):
+        """Returns a value saved with save_setting(), or None."""
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", ("setting:" + key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def save_setting(self, key, value):
+        """Saves a JSON-serializable value that later runs can read with setting()."""
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", ("setting:" + key, json.dumps(value)))
+
+    @staticmethod
+    def _row(device, position, data):
+        """Returns the table row of a device; 'data' is its JSON text."""
+        last_online = device.get("last_online")
+        try:
+            epoch = last_online_epoch(last_online) if last_online else None
+        except (TypeError, ValueError):
+            # Stored as unknown, like ColumnarInventory does: it never matches --offline_days
+            epoch = None
+        return (
+            device["guid"],
+            position,
+            device.get("id"),
+            device.get("device_name"),
+            device.get("user_name"),
+            device.get("device_group_name"),
+            epoch,
+            data,
+        )
+
+    def store(self, pages):
+        """Replaces the snapshot with the devices of all 'pages' (an iterable of API responses)."""
+        fetched_at = time.time()
+        position = 0
+        with self.db:
+            self.db.execute("DELETE FROM devices")
+            for page in pages:
+                rows = []
+                for device in page.get("data", []):
+                    rows.append(self._row(device, position, json.dumps(device)))
+                    position += 1
+                self.db.executemany("INSERT OR REPLACE INTO devices VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._reindex()
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('fetched_at', ?)", (str(fetched_at),))
+        logger.info(f"Inventory snapshot refreshed: {position} devices stored in {self.path}")
+
+    def refresh(self, pages):
+        """
+        Updates the snapshot from a full scan, writing only the difference.
+
+        Unchanged devices are not rewritten, so a refresh of a mostly stable
+        fleet costs the download but almost no database writes. Returns the
+        numbers of (added, changed, removed) devices.
+        """
+        fetched_at = time.time()
+        known = {guid: (position, data) for guid, position, data in self.db.execute("SELECT guid, position, data FROM devices")}
+        added = changed = 0
+        position = 0
+        with self.db:
+            for page in pages:
+                rows = []
+                for device in page.get("data", []):
+                    data = json.dumps(device)
+                    previous = known.pop(device["guid"], None)
+                    if previous != (position, data):
+                        if previous is None:
+                            added += 1
+                        elif previous[1] != data:
+                            changed += 1
+                        rows.append(self._row(device, position, data))
+                    position += 1
+                self.db.executemany("INSERT OR REPLACE INTO devices VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            # Devices that were not seen in the scan no longer exist
+            self.db.executemany("DELETE FROM devices WHERE guid = ?", ((guid,) for guid in known))
+            if added or changed or known:
+                self._reindex()
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('fetched_at', ?)", (str(fetched_at),))
+        logger.info(
+            f"Inventory snapshot refreshed: {added} added, {changed} changed, {len(known)} removed "
+            f"({position} devices in {self.path})"
+        )
+        return added, changed, len(known)
+
+    def remove(self, guids):
+        """Removes devices from the snapshot, e.g. after they were deleted on the server."""
+        columns = "rowid, id, device_name, user_name, device_group_name"
+        with self.db:
+            for guid in guids:
+                row = self.db.execute(f"SELECT {columns} FROM devices WHERE guid = ?", (guid,)).fetchone()
+                if row is None:
+                    continue
+                if self.search:
+                    # An external-content index needs the old values to drop a row
+                    self.db.execute(f"INSERT INTO devices_search (devices_search, {columns}) VALUES ('delete', ?, ?, ?, ?, ?)", row)
+                self.db.execute("DELETE FROM devices WHERE rowid = ?", (row[0],))
+
+    def invalidate(self):
+        """Marks the snapshot as stale, e.g. after devices were changed or deleted."""
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('fetched_at', '0')")
+
+    def query(
+        self,
+        id=None,
+        device_name=None,
+        user_name=None,
+        device_group_name=None,
+        offline_days=None,
+        no_group=False,
+        fields=(),
+    ):
+        """
+        Returns the devices matching the CLI filters, in server order.
+
+        The search filters follow the server's rules (see build_params):
+        values are matched as case-insensitive LIKE patterns, and "-"
+        matches devices where the field is empty. Plain values become
+        '%value%' patterns, which no B-tree index can answer; they are
+        looked up in the trigram index instead. Prefix patterns use the
+        column indexes.
+        """
+        sql = "SELECT data FROM devices WHERE 1 = 1"
+        values = []
+        search = build_params(id=id, device_name=device_name, user_name=user_name, device_group_name=device_group_name)
+        for column, pattern in search.items():
+            if pattern == "-":
+                sql += f" AND ({column} IS NULL OR {column} = '')"
+            elif self.search and pattern.startswith(("%", "_")):
+                sql += f" AND rowid IN (SELECT rowid FROM devices_search WHERE {column} LIKE ?)"
+                values.append(pattern)
+            else:
+                sql += f" AND {column} LIKE ?"
+                values.append(pattern)
+        if offline_days is not None:
+            sql += " AND last_online <= ?"
+            values.append(OfflineCutoff(offline_days).epoch)
+        if no_group:
+            sql += " AND (device_group_name IS NULL OR device_group_name = '')"
+        sql += " ORDER BY position"
+        return [Device.from_json(json.loads(row[0]), fields) for row in self.db.execute(sql, values)]
+
+    def close(self):
+        self.db.close()
+
+
+def open_snapshot(args, logger):
+    """
+    Returns the InventoryCache to use for this run, or None.
+
+    The device records do not contain the user group, so the snapshot is
+    not used with --group_name, nor in streaming mode. --columnar scans the
+    server into its own arrays, so it does not use the snapshot either.
+    """
+    if not args.cache_file or args.stream or args.columnar or args.group_name is not None:
+        if args.offline:
+            logger.error("--offline requires the inventory snapshot, which cannot be used with --group_name, --stream or --columnar")
+            exit(1)
+        return None
+    return InventoryCache(args.cache_file, args.url)
+
+
+def snapshot_is_usable(snapshot, args, logger):
+    """
+    Decides whether to answer from the snapshot instead of scanning the server.
+
+    'view' uses a snapshot younger than --cache_ttl. Commands that change
+    devices always rescan the server unless --offline is given, so they
+    never act on outdated data by accident. Even with --offline, they
+    require a snapshot younger than --cache_ttl: a device that came back
+    online since an older scan must not be deleted.
+    """
+    age = snapshot.age()
+    if args.offline:
+        if age is None:
+            logger.error(f"--offline: no inventory snapshot available in {snapshot.path}")
+            exit(1)
+        if args.command != "view" and age >= args.cache_ttl:
+            logger.error(
+                f"--offline: the inventory snapshot is {age:.0f} s old, '{args.command}' requires one younger "
+                f"than --cache_ttl ({args.cache_ttl} s). Run 'view' first to refresh it."
+            )
+            exit(1)
+        return True
+    if args.refresh or age is None or args.command != "view":
+        return False
+    return age < args.cache_ttl
+
+
+def iter_devices(
+    client,
+    id=None,
+    device_name=None,
+    user_name=None,
+    group_name=None,
+    device_group_name=None,
+    offline_days=None,
+    no_group=False,
+    fetch_workers=FETCH_WORKERS,
+    reverse=False,
+    fields=(),
+    page_size=PAGE_SIZE,
+):
+    """
+    Fetches devices from the RustDesk server and yields those matching the filters.
+    
+    Filters:
+    - offline_days: Only includes devices offline for at least X days.
+    - no_group: Only includes devices that are not assigned to any group.
+
+    Pages are fetched concurrently by 'fetch_workers' threads, but are
+    processed in page order so the result is deterministic. Devices are
+    yielded as soon as their page arrives, so only a few pages are held in
+    memory at a time. Matching devices are yielded as compact Device
+    records with the extra 'fields' requested.
+    """
+    pageSize = page_size
+    params = build_params(id, device_name, user_name, group_name, device_group_name)
+    params["pageSize"] = pageSize
+
+    cutoff = offline_cutoff(offline_days)
+
+    # Paginated API requests
+    for response_json in fetch_pages(client, params, pageSize, fetch_workers, reverse):
+        with STATS.phase("filter"):
+            matches = [
+                Device.from_json(device, fields)
+                for device in filter_devices(response_json.get("data", []), cutoff, no_group)
+            ]
+        STATS.add("matched", len(matches))
+        yield from matches
+
+
+def view(*args, **kwargs):
+    """Returns the list of matching devices (see iter_devices for the filters)."""
+    return list(iter_devices(*args, **kwargs))
+
+
+def check(response):
+    """Returns the decoded response, or raises ApiError if the request failed."""
+    if response.status_code != 200:
+        raise ApiError(f"HTTP {response.status_code} - {response.text}", response.status_code)
+    
+    try:
+        response_json = response.json()
+    except ValueError:
+        return response.text or "Success"
+    if "error" in response_json:
+        raise ApiError(response_json["error"])
+    return response_json
+
+
+def disable(client, guid, id):
+    """Sends a request to disable a device by its GUID."""
+    logger.debug(f"Disable {id}")
+    response = client.post(f"/api/devices/{guid}/disable")
+    return check(response)
+
+
+def enable(client, guid, id):
+    """Sends a request to enable a device by its GUID."""
+    logger.debug(f"Enable {id}")
+    response = client.post(f"/api/devices/{guid}/enable")
+    return check(response)
+
+
+def delete(client, guid, id):
+    """Sends a request to delete a device by its GUID."""
+    logger.debug(f"Delete {id}")
+    response = client.delete(f"/api/devices/{guid}")
+    if response.already_done:
+        return "Already deleted"
+    return check(response)
+
+
+def assign(client, guid, id, type, value):
+    """Sends a request to set a field ('type') of a device to 'value'."""
+    logger.debug(f"Assign {id} {type}={value}")
+    if type not in ASSIGN_TYPES:
+        raise ApiError(f"Invalid type, it must be one of: {', '.join(ASSIGN_TYPES)}")
+    data = {"type": type, "value": value}
+    response = client.post(f"/api/devices/{guid}/assign", json=data)
+    return check(response)
+
+
+def resumed_delete_gone(command, error, args, journal, completed=()):
+    """
+    True if a resumed delete got HTTP 404: the interrupted run deleted the
+    device after the last journal record that reached the disk. The same
+    holds for a retried delete whose earlier attempt ('completed' steps)
+    already disabled the device, as that attempt may have sent the delete.
+    """
+    return (
+        command == "delete" and not args.only_disable and getattr(error, "status", None) == 404
+        and ((journal is not None and args.resume) or "disable" in completed)
+    )
+
+
+def step_request(step, guid, *values):
+    """Returns the method, path and keyword arguments of the API request for a device step."""
+    if step == "delete":
+        return "DELETE", f"/api/devices/{guid}", {}
+    if step == "assign":
+        type, value = values
+        return "POST", f"/api/devices/{guid}/assign", {"json": {"type": type, "value": value}}
+    return "POST", f"/api/devices/{guid}/{step}", {}
+
+
+def device_steps(command, device, args, logger, journal=None, completed=()):
+    """
+    Performs 'command' on a single device and returns its outcome record.
+
+    The outcome lists the steps that completed for the device, e.g.
+    ["disable", "delete"]. For 'delete', the steps run strictly in order:
+    the device is only deleted after it has been disabled. If a request
+    fails, the error is stored in the outcome and the remaining steps for
+    that device are skipped.
+
+    With a CleanupJournal, every completed step and failure is recorded,
+    and a device that an interrupted run already disabled is not disabled
+    again. Likewise, a retry skips the steps 'completed' by the earlier
+    attempts of this run.
+
+    The sequence is shared by both engines: this generator yields each
+    request as (step, values) and is sent the decoded response, or gets
+    the exception of a failed request thrown in. process_device() and
+    async_process_device() send the requests.
+    """
+    outcome = {"id": device.id, "guid": device.guid, "done": []}
+
+    def done(step):
+        outcome["done"].append(step)
+        if journal is not None:
+            journal.record(device.guid, step)
+
+    try:
+        if command == "disable":
+            if args.dry_run:
+                logger.info(f"[Dry Run] Would disable device: {device.id} (GUID: {device.guid})")
+            else:
+                response = yield "disable", ()
+                done("disable")
+                logger.info(f"Disabled device {device.id}: {response}")
+        elif command == "enable":
+            if args.dry_run:
+                logger.info(f"[Dry Run] Would enable device: {device.id} (GUID: {device.guid})")
+            else:
+                response = yield "enable", ()
+                done("enable")
+                logger.info(f"Enabled device {device.id}: {response}")
+        elif command == "delete":
+            if args.dry_run:
+                action = "disable" if args.only_disable else "disable and delete"
+                logger.info(f"[Dry Run] Would {action} device: {device.id} (GUID: {device.guid})")
+            else:
+                if "disable" in completed:
+                    logger.info(f"Device {device.id} was already disabled by an earlier attempt.")
+                elif journal is not None and "disable" in journal.completed(device.guid):
+                    logger.info(f"Device {device.id} was already disabled by the interrupted run.")
+                else:
+                    # MANDATORY RUSTDESK LOGIC: A client MUST be disabled before it can be deleted.
+                    logger.info(f"Processing device {device.id}. Disabling first (required for deletion)...")
+                    disable_response = yield "disable", ()
+                    done("disable")
+                    logger.info(f"Disable response for {device.id}: {disable_response}")
+
+                if args.only_disable:
+                    logger.info(f"ONLY_DISABLE is active. Skipping deletion for {device.id}.")
+                else:
+                    # Proceeding to final deletion
+                    logger.info(f"Proceeding to delete device {device.id}...")
+                    delete_response = yield "delete", ()
+                    done("delete")
+                    logger.info(f"Delete response for {device.id}: {delete_response}")
+        elif command == "assign":
+            type, value = args.assign_to.split("=", 1)
+            if args.dry_run:
+                logger.info(f"[Dry Run] Would assign {type}={value} to device: {device.id}")
+            else:
+                response = yield "assign", (type, value)
+                done("assign")
+                logger.info(f"Assigned {type}={value} to {device.id}: {response}")
+    except REQUEST_ERRORS as e:
+        if resumed_delete_gone(command, e, args, journal, completed):
+            run = "an earlier attempt" if "disable" in completed else "the interrupted run"
+            logger.info(f"Device {device.id} no longer exists, it was deleted by {run}.")
+            done("delete")
+            return outcome
+        # Recorded per device so the other devices and the summary are unaffected
+        outcome["error"] = str(e)
+        outcome["retryable"] = is_retryable(e)
+        logger.error(f"Failed to {command} device {device.id}: {e}")
+        if journal is not None:
+            journal.fail(device.guid, str(e))
+
+    return outcome
+
+
+def process_device(client, command, device, args, logger, journal=None, completed=()):
+    """Runs device_steps() for one device with the threaded client and returns its outcome record."""
+    actions = {"disable": disable, "enable": enable, "delete": delete, "assign": assign}
+    steps = device_steps(command, device, args, logger, journal, completed)
+    response = error = None
+    while True:
+        try:
+            step, values = steps.send(response) if error is None else steps.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        response = error = None
+        try:
+            response = actions[step](client, device.guid, device.id, *values)
+        except REQUEST_ERRORS as e:
+            error = e
+
+
+def skipped_outcome(device):
+    """Outcome of a device that was not attempted because the error budget was exhausted."""
+    return {"id": device.id, "guid": device.guid, "done": [], "skipped": True}
+
+
+def merge_retry(previous, outcome):
+    """Combines a retried outcome with the steps its earlier attempt completed."""
+    if outcome.get("skipped"):
+        # Not retried because the error budget ran out, so the earlier failure stands
+        return previous
+    outcome["done"] = previous["done"] + [step for step in outcome["done"] if step not in previous["done"]]
+    return outcome
+
+
+def retry_rounds(outcomes, budget, logger):
+    """
+    Yields the indexes of the outcomes to retry, once per retry round. The
+    caller waits RETRY_DELAY seconds before each round. Stops when nothing
+    is left to retry or the error budget is exhausted.
+    """
+    for round in range(1, RETRY_ROUNDS + 1):
+        retry = [index for index, outcome in enumerate(outcomes) if outcome.get("retryable")]
+        if not retry or budget.exhausted:
+            return
+        logger.info(f"Retrying {len(retry)} devices with retryable errors in {RETRY_DELAY} s (round {round} of {RETRY_ROUNDS})...")
+        yield retry
+
+
+def run_actions(client, command, devices, args, logger, journal=None, budget=None):
+    """
+    Runs 'command' for all devices on a pool of 'args.action_workers' threads.
+
+    Each device is handled by exactly one worker, so the order of steps
+    within a device is preserved. Devices that failed with a retryable
+    error are queued and tried again after the other devices, and no new
+    device is started once the error 'budget' is exhausted. Returns the
+    outcome table in device order.
+    """
+    budget = budget or ErrorBudget()
+
+    def action(device, completed):
+        if budget.exhausted:
+            return skipped_outcome(device)
+        outcome = process_device(client, command, device, args, logger, journal, completed)
+        budget.add(outcome)
+        return outcome
+
+    def run_all(batch, completed):
+        if args.action_workers <= 1:
+            return [action(device, steps) for device, steps in zip(batch, completed)]
+        with ThreadPoolExecutor(max_workers=args.action_workers) as executor:
+            return list(executor.map(action, batch, completed))
+
+    devices = list(devices)
+    with STATS.phase("action"):
+        outcomes = run_all(devices, [()] * len(devices))
+        for retry in retry_rounds(outcomes, budget, logger):
+            time.sleep(RETRY_DELAY)
+            batch = run_all([devices[index] for index in retry], [outcomes[index]["done"] for index in retry])
+            for index, outcome in zip(retry, batch):
+                outcomes[index] = merge_retry(outcomes[index], outcome)
+    return outcomes
+
+
+def stream_actions(client, command, devices, args, logger, summary, budget=None):
+    """
+    Runs 'command' on devices from an iterator while it is still being fetched.
+
+    A producer thread reads 'devices' into a bounded queue which feeds
+    'args.action_workers' worker threads, so actions start as soon as the
+    first page has arrived and memory use stays flat for any fleet size.
+    Outcomes are added to 'summary' instead of being collected; devices
+    with retryable errors are kept back and retried once the stream ends.
+    Fetching stops when the error 'budget' is exhausted.
+    """
+    budget = budget or ErrorBudget()
+    workers = max(1, args.action_workers)
+    work = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    stop = threading.Event()
+    errors = []
+    retry_queue = []
+
+    def produce():
+        try:
+            for device in devices:
+                if stop.is_set():
+                    break
+                work.put(device)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            for _ in range(workers):
+                work.put(None)
+
+    def consume():
+        while True:
+            device = work.get()
+            if device is None:
+                return
+            if stop.is_set():
+                # Keep draining so the producer is never blocked on a full queue
+                if budget.exhausted:
+                    summary.add(skipped_outcome(device))
+                continue
+            try:
+                outcome = process_device(client, command, device, args, logger)
+                budget.add(outcome)
+                if budget.exhausted:
+                    stop.set()
+                if outcome.get("retryable"):
+                    with lock:
+                        retry_queue.append((device, outcome))
+                else:
+                    summary.add(outcome)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+    lock = threading.Lock()
+    threads = [threading.Thread(target=produce)]
+    threads += [threading.Thread(target=consume) for _ in range(workers)]
+    with STATS.phase("action"):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+        retry_devices = [device for device, _ in retry_queue]
+        outcomes = [outcome for _, outcome in retry_queue]
+        for retry in retry_rounds(outcomes, budget, logger):
+            time.sleep(RETRY_DELAY)
+            for index in retry:
+                if budget.exhausted:
+                    break
+                outcome = process_device(client, command, retry_devices[index], args, logger, completed=outcomes[index]["done"])
+                budget.add(outcome)
+                outcomes[index] = merge_retry(outcomes[index], outcome)
+    for outcome in outcomes:
+        summary.add(outcome)
+
+
+class Summary:
+    """Running tally of device outcomes. Only failed outcomes are kept."""
+
+    def __init__(self):
+        self.total = 0
+        self.counts = {}
+        self.failed = []
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def add(self, outcome):
+        with self._lock:
+            self.total += 1
+            for step in outcome["done"]:
+                self.counts[step] = self.counts.get(step, 0) + 1
+                STATS.add(step)
+            if "error" in outcome:
+                self.failed.append(outcome)
+                STATS.add("failed")
+            elif outcome.get("skipped"):
+                self.skipped += 1
+                STATS.add("skipped")
+
+    def log(self, logger):
+        """Logs how many devices completed each step, followed by a report of what failed."""
+        steps = ", ".join(f"{step}: {count}" for step, count in self.counts.items()) or "no changes"
+        logger.info(f"Summary for {self.total} devices - {steps}, failed: {len(self.failed)}, skipped: {self.skipped}")
+        if not self.failed:
+            return
+
+        retryable = sum(1 for outcome in self.failed if outcome.get("retryable"))
+        logger.error(
+            f"Failure report: {len(self.failed)} devices failed - {len(self.failed) - retryable} permanent errors, "
+            f"{retryable} retryable errors that persisted after {RETRY_ROUNDS} retries"
+        )
+        errors = {}
+        for outcome in self.failed:
+            errors[outcome["error"]] = errors.get(outcome["error"], 0) + 1
+        for error, count in sorted(errors.items(), key=lambda item: -item[1]):
+            logger.error(f"  {count} x {error}")
+        for outcome in self.failed:
+            logger.error(f"Failed device {outcome['id']} (GUID: {outcome['guid']}): {outcome['error']}")
+
+
+def confirmed(devices, args, logger):
+    """Safety check for multiple devices: requires --yes unless this is a dry run."""
+    if len(devices) > 1 and not args.yes and not args.dry_run:
+        logger.warning(f"Found {len(devices)} devices. Operation '{args.command}' requires --yes or -y flag for multiple devices without interaction.")
+        print(f"Found {len(devices)} devices. Use --yes or -y to confirm this operation in a script.")
+        return False
+    return True
+
+
+class CleanupJournal:
+    """
+    Append-only journal of one disable/enable/delete/assign run, one JSON
+    record per line.
+
+    The run header and the planned devices are written before the first
+    request, followed by every completed step ("disable", "delete", ...)
+    and every failure. Each record is handed to the OS immediately, so it
+    survives the process being killed; fsync runs in batches of
+    'sync_every' records, so a reboot loses at most the last batch. With
+    --resume, the devices of an unfinished run are read back from the
+    journal instead of rescanning the server.
+    """
+
+    def __init__(self, path, sync_every=JOURNAL_SYNC_EVERY):
+        self.path = path
+        self.sync_every = max(1, sync_every)
+        self.header = None
+        self.planned = []
+        self.steps = {}
+        self.finished = False
+        self.file = None
+        self._unsynced = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Reads the last run from the journal. Returns False if there is none."""
+        try:
+            f = open(self.path)
+        except FileNotFoundError:
+            return False
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line torn by a crash
+                    continue
+                if "run" in record:
+                    self.header, self.planned, self.steps, self.finished = record["run"], [], {}, False
+                elif "plan" in record:
+                    self.planned.append(record["plan"])
+                elif "step" in record:
+                    self.steps.setdefault(record["guid"], set()).add(record["step"])
+                elif "finished" in record:
+                    self.finished = True
+        return self.header is not None
+
+    def start(self, header, devices):
+        """Replaces the journal with a new run that will act on 'devices'."""
+        self.finished = False
+        self.file = open(self.path, "w")
+        self._write({"run": header})
+        for device in devices:
+            self._write({"plan": device.as_dict()})
+        self.sync()
+
+    def resume(self):
+        """Continues the loaded run; new records are appended to it."""
+        self.file = open(self.path, "a")
+
+    def completed(self, guid):
+        """Returns the steps the journal has recorded for a device."""
+        return self.steps.get(guid, ())
+
+    def record(self, guid, step):
+        self._write({"guid": guid, "step": step})
+
+    def fail(self, guid, error):
+        self._write({"guid": guid, "error": error})
+
+    def finish(self):
+        """Marks the run as complete; a finished run is not resumed."""
+        if self.finished:
+            # --resume of a run that had already finished, the journal was not reopened
+            return
+        self._write({"finished": True})
+        self.sync()
+        self.finished = True
+
+    def _write(self, record):
+        with self._lock:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self._sync()
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+
+def journal_header(args):
+    """Describes a run in the journal, so --resume can check it continues the same operation."""
+    return {
+        "command": args.command,
+        "only_disable": args.only_disable,
+        "assign_to": args.assign_to,
+        "started": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def open_journal(args, logger):
+    """
+    Returns the CleanupJournal for this run, or None.
+
+    Only runs that change devices are journaled. Streaming runs do not know
+    their devices in advance, so they cannot be journaled or resumed.
+    """
+    if args.command not in ("disable", "enable", "delete", "assign") or args.dry_run:
+        if args.resume:
+            logger.error("--resume only applies to disable, enable, delete and assign without --dry_run")
+            exit(1)
+        return None
+    if not args.journal_file or args.stream:
+        if args.resume:
+            logger.error("--resume requires a journal file and cannot be used with --stream")
+            exit(1)
+        return None
+    return CleanupJournal(args.journal_file)
+
+
+def resume_devices(journal, args, logger):
+    """Returns the devices an interrupted run still has to process."""
+    if not journal.load():
+        logger.error(f"--resume: no journal found in {journal.path}")
+        exit(1)
+    header = journal.header
+    if (header["command"], header["only_disable"], header["assign_to"]) != (args.command, args.only_disable, args.assign_to):
+        logger.error(
+            f"--resume: the journal in {journal.path} belongs to '{header['command']}' started {header['started']} "
+            f"with different options"
+        )
+        exit(1)
+    if journal.finished:
+        logger.info(f"--resume: the run started {header['started']} has already finished, nothing to resume")
+        return []
+
+    final = "disable" if args.command == "delete" and args.only_disable else args.command
+    devices = [
+        Device.from_json(device, args.fields)
+        for device in journal.planned
+        if final not in journal.completed(device["guid"])
+    ]
+    logger.info(
+        f"Resuming '{args.command}' started {header['started']}: "
+        f"{len(journal.planned) - len(devices)} of {len(journal.planned)} devices already done, {len(devices)} remaining"
+    )
+    journal.resume()
+    return devices
+
+
+class AsyncRustDeskClient:
+    """
+    asyncio counterpart of RustDeskClient, used by '--engine async'.
+
+    Keeps up to 'limit' requests in flight on a single thread, and retries,
+    times out and hedges like RustDeskClient. Requires the optional
+    'aiohttp' package (pip install aiohttp).
+    """
+
+    def __init__(
+        self, url, token, limit=ASYNC_LIMIT, controller=None, limits=None, retries=None,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), deadline=None, hedge=None,
+    ):
+        self.url = url
+        self.token = token
+        self.limit = max(1, limit)
+        self.controller = controller
+        self.limits = limits or {}
+        self.retries = MAX_RETRIES if retries is None else retries
+        self.timeout = timeout
+        self.deadline = deadline or Deadline()
+        self.hedge = hedge
+        self._in_flight = 0
+
+    async def __aenter__(self):
+        self.semaphore = asyncio.Semaphore(self.limit)
+        self._slot = asyncio.Condition()
+        self.session = aiohttp.ClientSession(
+            headers={"Authorization": f"Bearer {self.token}"},
+            connector=aiohttp.TCPConnector(limit=self.limit),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def request(self, method, path, **kwargs):
+        """Sends a request and returns the decoded response, or raises ApiError."""
+        retries = self.retries.get(endpoint_action(method, path), 0)
+        backoff = Backoff()
+        for attempt in range(retries + 1):
+            error = None
+            try:
+                status, text, headers = await self._send(method, path, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+                reason = str(e) or type(e).__name__
+                delay = backoff.next()
+            else:
+                if status not in RETRYABLE_STATUSES:
+                    break
+                reason = f"HTTP {status}"
+                delay = backoff.next(retry_after(headers.get("Retry-After")))
+            remaining = self.deadline.remaining()
+            if attempt == retries or (remaining is not None and remaining < delay):
+                if error is not None:
+                    # A timeout shortened by the run deadline is reported as such
+                    self.deadline.check()
+                    raise error
+                break
+            logger.warning(f"{method} {path} failed ({reason}), retry {attempt + 1} of {retries} in {delay:.1f} s")
+            STATS.retry(method, path, delay)
+            await asyncio.sleep(delay)
+        if attempt > 0 and method == "DELETE" and status == 404:
+            # An earlier attempt deleted the device, but its response was lost
+            return "Already deleted"
+        if status != 200:
+            raise ApiError(f"HTTP {status} - {text}", status)
+
+        try:
+            response_json = json.loads(text)
+        except ValueError:
+            return text or "Success"
+        if isinstance(response_json, dict) and "error" in response_json:
+            raise ApiError(response_json["error"])
+        return response_json
+
+    async def get_page(self, path, **kwargs):
+        """asyncio counterpart of RustDeskClient.get_page(); the slower request is cancelled."""
+        if self.hedge is None:
+            return await self.request("GET", path, **kwargs)
+        start = time.monotonic()
+        delay = self.hedge.delay()
+        tasks = {asyncio.ensure_future(self.request("GET", path, **kwargs))}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    logger.debug(f"GET {path} slower than {delay * 1000:.0f} ms, sending a hedged request")
+                    tasks.add(asyncio.ensure_future(self.request("GET", path, **kwargs)))
+            hedged = len(tasks) > 1
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                answers = [task for task in done if task.exception() is None]
+                if answers or not tasks:
+                    self.hedge.record(time.monotonic() - start, hedged)
+                    return (answers or list(done))[0].result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _send(self, method, path, **kwargs):
+        """Sends one request and returns (status, text, headers)."""
+        connect, read = self.deadline.timeout(*self.timeout)
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=self.deadline.remaining(), sock_connect=connect, sock_read=read)
+        kind = "read" if method == "GET" else "write"
+        delay = rate_limit_delay(self.limits, kind)
+        if delay:
+            await asyncio.sleep(delay)
+        async with self.semaphore:
+            if self.controller is not None:
+                async with self._slot:
+                    await self._slot.wait_for(lambda: self._in_flight < self.controller.slots())
+                    self._in_flight += 1
+            start = time.monotonic()
+            status = None
+            received = 0
+            cancelled = False
+            try:
+                async with self.session.request(method, f"{self.url}{path}", **kwargs) as response:
+                    status = response.status
+                    headers = response.headers
+                    received = len(await response.read())
+                    text = await response.text()
+            except asyncio.CancelledError:
+                # A hedged page request that lost the race is neither an error nor a latency sample
+                cancelled = True
+                raise
+            finally:
+                latency = time.monotonic() - start
+                sent = len(json.dumps(kwargs["json"]).encode()) if "json" in kwargs else 0
+                if not cancelled:
+                    STATS.record(method, path, latency, status, sent, received)
+                if self.controller is not None:
+                    if not cancelled:
+                        self.controller.record(kind, latency, status)
+                    async with self._slot:
+                        self._in_flight -= 1
+                        self._slot.notify_all()
+        return status, text, headers
 
-# --- CONFIGURATION ---
-DRY_RUN = True           # True = Simulation only | False = Real deletion/disabling
-AUTO_CONFIRM = True      # True = Automatically confirm multiple devices (required for cron)
-API_URL = "https://your-rustdesk-server.com"
-API_TOKEN = "your-bearer-token-here"
 
-# Filter Options (Default values for automated runs)
-DELETE_UNGROUPED = True  # True = Only target devices without a group
-OFFLINE_DAYS = None      # None = Disable filter | Integer (e.g. 3) = Only devices offline for X days
+async def async_fetch_pages(client, params, page_size):
+    """Fetches all device list pages concurrently and returns them in page order."""
+    params = {k: str(v) for k, v in params.items()}
 
-# Process Options
-# NOTE: RustDesk requires devices to be DISABLED before they can be DELETED.
-DISABLE_BEFORE_DELETE = True  # Must stay True for successful deletion in RustDesk
-ONLY_DISABLE = False          # Set to True to only disable clients without deleting them
-# ---------------------
+    async def fetch(current):
+        page = await client.get_page("/api/devices", params=dict(params, current=str(current)))
+        STATS.add("pages")
+        STATS.add("scanned", len(page.get("data", [])))
+        return page
 
+    with STATS.phase("scan"):
+        first = await fetch(1)
+        total = first.get("total", 0)
+        page_size, params = capped_page_size(first, page_size, params)
+        if len(first.get("data", [])) < page_size or page_size >= total:
+            return [first]
+        last_page = -(-total // page_size)
+        return [first] + list(await asyncio.gather(*(fetch(current) for current in range(2, last_page + 1))))
 
-def view(
-    url,
-    token,
-    id=None,
-    device_name=None,
-    user_name=None,
-    group_name=None,
-    device_group_name=None,
-    offline_days=None,
-    no_group=False,
-):
-    """
-    Fetches and filters devices from the RustDesk server.
-    
-    Filters:
-    - offline_days: Only includes devices offline for at least X days.
-    - no_group: Only includes devices that are not assigned to any group.
+
+async def async_process_device(client, command, device, args, logger, journal=None, completed=()):
+    """asyncio counterpart of process_device(): runs device_steps() with the AsyncRustDeskClient."""
+    steps = device_steps(command, device, args, logger, journal, completed)
+    response = error = None
+    while True:
+        try:
+            step, values = steps.send(response) if error is None else steps.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        response = error = None
+        method, path, kwargs = step_request(step, device.guid, *values)
+        try:
+            response = await client.request(method, path, **kwargs)
+        except REQUEST_ERRORS as e:
+            error = e
+
+
+async def async_run(args, logger, controller=None, limits=None, snapshot=None, journal=None, deadline=None):
     """
-    headers = {"Authorization": f"Bearer {token}"}
-    pageSize = 100
-    params = {
-        "id": id,
-        "device_name": device_name,
-        "user_name": user_name,
-        "group_name": group_name,
-        "device_group_name": device_group_name,
-    }
+    asyncio counterpart of run(): all pages are fetched and all devices are
+    processed concurrently, limited by 'args.async_limit' requests in flight.
 
-    # Add wildcards to search parameters if not already present
-    params = {
-        k: "%" + v + "%" if (v != "-" and "%" not in v) else v
-        for k, v in params.items()
-        if v is not None
-    }
+    At most 'args.async_limit' devices are in progress at a time, and the
+    error budget is checked when a device gets its turn, like a worker
+    thread of run_actions() would. Returns True if at least one device
+    failed.
+    """
+    pageSize = args.page_size
+    params = build_params(args.id, args.device_name, args.user_name, args.group_name, args.device_group_name)
     params["pageSize"] = pageSize
 
-    devices = []
-    current = 0
+    async with AsyncRustDeskClient(
+        args.url, args.token, args.async_limit, controller, limits, retry_limits(args.max_retries),
+        (args.connect_timeout, args.read_timeout), deadline, HedgePolicy() if args.hedge else None,
+    ) as client:
+        if journal is not None and args.resume:
+            devices = resume_devices(journal, args, logger)
+        elif snapshot is not None and snapshot_is_usable(snapshot, args, logger):
+            devices = query_snapshot(snapshot, args)
+        elif snapshot is not None and not has_search_filters(args):
+            snapshot.store(await async_fetch_pages(client, {"pageSize": pageSize}, pageSize))
+            devices = query_snapshot(snapshot, args)
+        elif args.columnar:
+            pages = await async_fetch_pages(client, params, pageSize)
+            with STATS.phase("filter"):
+                inventory = ColumnarInventory(args.fields)
+                for page in pages:
+                    inventory.add_page(page.get("data", []))
+                devices = inventory.select(offline_cutoff(args.offline_days), args.no_group)
+            STATS.add("matched", len(devices))
+        else:
+            pages = await async_fetch_pages(client, params, pageSize)
+            with STATS.phase("filter"):
+                cutoff = offline_cutoff(args.offline_days)
+                devices = [
+                    Device.from_json(device, args.fields)
+                    for page in pages
+                    for device in filter_devices(page.get("data", []), cutoff, args.no_group)
+                ]
+            STATS.add("matched", len(devices))
 
-    # Paginated API requests
-    while True:
-        current += 1
-        params["current"] = current
-        response = requests.get(f"{url}/api/devices", headers=headers, params=params)
-        if response.status_code != 200:
-            print(f"Error: HTTP {response.status_code} - {response.text}")
-            exit(1)
-        
-        response_json = response.json()
-        if "error" in response_json:
-            print(f"Error: {response_json['error']}")
-            exit(1)
+        if args.command == "view":
+            for device in devices:
+                print(device)
+            return False
 
-        data = response_json.get("data", [])
+        if not confirmed(devices, args, logger):
+            return False
 
-        # Apply custom filters locally
-        for device in data:
-            # 1. Filter by offline duration
-            if offline_days is not None:
-                last_online_str = device.get("last_online")
-                if not last_online_str:
-                    continue
-                last_online = datetime.strptime(
-                    last_online_str.split(".")[0], "%Y-%m-%dT%H:%M:%S"
-                )
-                if (datetime.utcnow() - last_online).days < offline_days:
-                    continue
-            
-            # 2. Filter by group membership
-            if no_group:
-                # If a group name is present, the device is not 'ungrouped'
-                if device.get("device_group_name"):
-                    continue
-            
-            devices.append(device)
+        if journal is not None and not args.resume:
+            journal.start(journal_header(args), devices)
+        budget = ErrorBudget(args.max_errors, args.max_error_rate, client.deadline)
+        slots = asyncio.Semaphore(max(1, args.async_limit))
 
-        total = response_json.get("total", 0)
-        # Check if we've reached the end of the list
-        if len(data) < pageSize or current * pageSize >= total:
-            break
+        async def attempt(device, completed=()):
+            async with slots:
+                if budget.exhausted:
+                    return skipped_outcome(device)
+                outcome = await async_process_device(client, args.command, device, args, logger, journal, completed)
+                budget.add(outcome)
+                return outcome
 
+        with STATS.phase("action"):
+            outcomes = await asyncio.gather(*(attempt(device) for device in devices))
+            for retry in retry_rounds(outcomes, budget, logger):
+                await asyncio.sleep(RETRY_DELAY)
+                retried = await asyncio.gather(*(attempt(devices[index], outcomes[index]["done"]) for index in retry))
+                for index, outcome in zip(retry, retried):
+                    outcomes[index] = merge_retry(outcomes[index], outcome)
+        return finish_actions(outcomes, args, logger, snapshot, journal)
+
+
+def query_snapshot(snapshot, args, count=True):
+    """Answers the CLI filters of 'args' from the snapshot ('count': adds them to the "matched" counter)."""
+    with STATS.phase("filter"):
+        devices = snapshot.query(
+            args.id,
+            args.device_name,
+            args.user_name,
+            args.device_group_name,
+            args.offline_days,
+            args.no_group,
+            args.fields,
+        )
+    if count:
+        STATS.add("matched", len(devices))
     return devices
 
 
-def check(response):
-    if response.status_code != 200:
-        print(f"Error: HTTP {response.status_code} - {response.text}")
-        exit(1)
-    
-    try:
-        response_json = response.json()
-        if "error" in response_json:
-            print(f"Error: {response_json['error']}")
-            exit(1)
-        return response_json
-    except ValueError:
-        return response.text or "Success"
+def run(client, args, logger, snapshot=None, journal=None):
+    """
+    Fetches the matching devices and performs 'args.command' on them.
 
+    If an InventoryCache 'snapshot' is given, the devices are read from it
+    when it is fresh. Otherwise an unfiltered run refreshes it by a full
+    scan, while search filters are sent to the server as usual. If a
+    CleanupJournal is given, the run is journaled, or with --resume, the
+    remaining devices of the interrupted run are taken from it.
 
-def disable(url, token, guid, id):
-    """Sends a request to disable a device by its GUID."""
-    print("Disable", id)
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.post(f"{url}/api/devices/{guid}/disable", headers=headers)
-    return check(response)
+    Returns True if at least one device failed.
+    """
+    if args.count:
+        return count_devices(client, args, snapshot, logger)
+    if args.stream:
+        return run_streaming(client, args, logger)
 
+    if journal is not None and args.resume:
+        devices = resume_devices(journal, args, logger)
+    elif snapshot is not None and snapshot_is_usable(snapshot, args, logger):
+        devices = query_snapshot(snapshot, args)
+    elif snapshot is not None and not has_search_filters(args):
+        # An unfiltered scan downloads the whole inventory anyway, so it refreshes the snapshot
+        pageSize = args.page_size
+        snapshot.store(fetch_pages(client, {"pageSize": pageSize}, pageSize, args.fetch_workers))
+        devices = query_snapshot(snapshot, args)
+    elif args.columnar:
+        pageSize = args.page_size
+        params = build_params(args.id, args.device_name, args.user_name, args.group_name, args.device_group_name)
+        params["pageSize"] = pageSize
+        inventory = ColumnarInventory(args.fields)
+        for page in fetch_pages(client, params, pageSize, args.fetch_workers):
+            with STATS.phase("filter"):
+                inventory.add_page(page.get("data", []))
+        with STATS.phase("filter"):
+            devices = inventory.select(offline_cutoff(args.offline_days), args.no_group)
+        STATS.add("matched", len(devices))
+    else:
+        devices = view(
+            client,
+            args.id,
+            args.device_name,
+            args.user_name,
+            args.group_name,
+            args.device_group_name,
+            args.offline_days,
+            args.no_group,
+            args.fetch_workers,
+            fields=args.fields,
+            page_size=args.page_size,
+        )
 
-def enable(url, token, guid, id):
-    """Sends a request to enable a device by its GUID."""
-    print("Enable", id)
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.post(f"{url}/api/devices/{guid}/enable", headers=headers)
-    return check(response)
+    if args.command == "view":
+        for device in devices:
+            print(device)
+    elif args.command in ["disable", "enable", "delete", "assign"]:
+        if not confirmed(devices, args, logger):
+            return False
 
+        if journal is not None and not args.resume:
+            journal.start(journal_header(args), devices)
+        budget = ErrorBudget(args.max_errors, args.max_error_rate, client.deadline)
+        outcomes = run_actions(client, args.command, devices, args, logger, journal, budget)
+        return finish_actions(outcomes, args, logger, snapshot, journal)
+    return False
 
-def delete(url, token, guid, id):
-    """Sends a request to delete a device by its GUID."""
-    print("Delete", id)
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.delete(f"{url}/api/devices/{guid}", headers=headers)
-    return check(response)
 
+def finish_actions(outcomes, args, logger, snapshot=None, journal=None):
+    """
+    Ends the device actions of run() or async_run(): closes the journaled
+    run, marks the snapshot as stale and logs the summary. Returns True if
+    at least one device failed.
 
-def assign(url, token, guid, id, type, value):
-    print("assign", id, type, value)
-    valid_types = [
-        "ab",
-        "strategy_name",
-        "user_name",
-        "device_group_name",
-        "note",
-        "device_username",
-        "device_name",
-    ]
-    if type not in valid_types:
-        print(f"Invalid type, it must be one of: {', '.join(valid_types)}")
-        return
-    data = {"type": type, "value": value}
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.post(
-        f"{url}/api/devices/{guid}/assign", headers=headers, json=data
+    A run that skipped devices (error budget or deadline exhausted) is not
+    marked as finished, so --resume can continue it later.
+    """
+    skipped = sum(1 for outcome in outcomes if outcome.get("skipped"))
+    if journal is not None and skipped:
+        logger.info(f"{skipped} devices were skipped; continue the run with --resume")
+    elif journal is not None:
+        journal.finish()
+    if snapshot is not None and not args.dry_run:
+        snapshot.invalidate()
+    summary = Summary()
+    for outcome in outcomes:
+        summary.add(outcome)
+    summary.log(logger)
+    return bool(summary.failed)
+
+
+def count_devices(client, args, snapshot, logger):
+    """
+    Prints the number of matching devices ('view --count'). Returns False.
+
+    A fresh snapshot answers directly. Otherwise, without local filters (see
+    has_local_filters) the server applies all filters and the count is the
+    'total' of a one-device page, so it takes a single request. With local
+    filters, the pages are streamed and only counted; no device records are
+    kept.
+    """
+    if snapshot is not None and snapshot_is_usable(snapshot, args, logger):
+        count = len(query_snapshot(snapshot, args))
+    else:
+        params = build_params(args.id, args.device_name, args.user_name, args.group_name, args.device_group_name)
+        if not has_local_filters(args):
+            if args.no_group:
+                params["device_group_name"] = "-"
+            with STATS.phase("scan"):
+                count = fetch_page(client, dict(params, pageSize=1), 1).get("total", 0)
+        else:
+            cutoff = offline_cutoff(args.offline_days)
+            count = 0
+            for page in fetch_pages(client, dict(params, pageSize=args.page_size), args.page_size, args.fetch_workers):
+                with STATS.phase("filter"):
+                    count += sum(1 for _ in filter_devices(page.get("data", []), cutoff, args.no_group))
+    STATS.add("matched", count)
+    logger.info(f"{count} devices match the filters")
+    print(count)
+    return False
+
+
+def run_streaming(client, args, logger):
+    """
+    Streaming variant of run(): devices are acted on while later pages are
+    still being fetched. Returns True if at least one device failed.
+    """
+    # Deleting devices shifts the pages after them, so read the list backwards
+    deleting = args.command == "delete" and not args.only_disable and not args.dry_run
+    devices = iter_devices(
+        client,
+        args.id,
+        args.device_name,
+        args.user_name,
+        args.group_name,
+        args.device_group_name,
+        args.offline_days,
+        args.no_group,
+        args.fetch_workers,
+        reverse=deleting,
+        fields=args.fields,
+        page_size=args.page_size,
     )
-    return check(response)
+
+    if args.command == "view":
+        for device in devices:
+            print(device)
+        return False
+
+    # The number of devices is unknown up front, so confirmation is required
+    if not args.yes and not args.dry_run:
+        logger.warning(f"Operation '{args.command}' in streaming mode requires --yes or -y flag.")
+        print("Streaming mode cannot count devices in advance. Use --yes or -y to confirm this operation.")
+        return False
+
+    summary = Summary()
+    stream_actions(client, args.command, devices, args, logger, summary, ErrorBudget(args.max_errors, args.max_error_rate, client.deadline))
+    summary.log(logger)
+    return bool(summary.failed)
+
+
+class CronSchedule:
+    """
+    Cron-like schedule: "minute hour day month day_of_week" in local time.
+
+    Each field accepts '*', numbers, ranges (1-5), lists (1,15) and steps
+    (*/15, 0-30/10). Like cron, a day matches if either the day of the month
+    or the day of the week matches when both are restricted. Day of week 0
+    (or 7) is Sunday.
+    """
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Invalid schedule '{expression}', expected 5 fields: minute hour day month day_of_week")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for item in field.split(","):
+            base, _, step = item.partition("/")
+            if base == "*":
+                start, end = low, high
+            elif "-" in base:
+                start, end = (int(value) for value in base.split("-", 1))
+            else:
+                start = end = int(base)
+                if step:
+                    end = high
+            if not low <= start <= end <= high:
+                raise ValueError(f"Invalid schedule field '{field}', values must be between {low} and {high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        # isoweekday(): Monday = 1 ... Sunday = 7
+        weekday = moment.isoweekday() % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment):
+        """Returns the first scheduled minute after 'moment' (a naive local datetime)."""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Four years always contain every valid day (including February 29)
+        limit = moment + timedelta(days=4 * 366)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Schedule '{self.expression}' never matches")
+
+
+def verify_candidates(client, devices, args):
+    """
+    Re-reads each candidate from the server by its ID and returns those
+    that still match the filters, so the daemon never acts on a device that
+    came back online or was assigned a group since the last refresh.
+    """
+    cutoff = offline_cutoff(args.offline_days)
+
+    def still_matching(device):
+        page = fetch_page(client, {"id": device.id, "pageSize": args.page_size}, 1)
+        current = [data for data in page.get("data", []) if data.get("guid") == device.guid]
+        return [Device.from_json(data, args.fields) for data in filter_devices(current, cutoff, args.no_group)]
+
+    with ThreadPoolExecutor(max_workers=max(1, args.fetch_workers)) as executor:
+        return [device for matches in executor.map(still_matching, devices) for device in matches]
+
+
+def run_policy(client, snapshot, args, logger):
+    """
+    One scheduled run of the daemon: selects the candidates from the
+    in-memory inventory, verifies them against the server and performs
+    'args.command' on them. Returns True if at least one device failed.
+
+    Verifying a few candidates by ID costs far less than a full scan. If
+    there are more candidates than a full scan has pages, the inventory is
+    refreshed instead.
+    """
+    devices = query_snapshot(snapshot, args, count=False)
+    refresh = args.command != "view" and len(devices) > -(-len(snapshot) // args.page_size)
+    if refresh:
+        snapshot.refresh(fetch_pages(client, {"pageSize": args.page_size}, args.page_size, args.fetch_workers))
+        devices = query_snapshot(snapshot, args, count=False)
+    STATS.add("matched", len(devices))
+    if args.command != "view" and devices and not refresh:
+        with STATS.phase("scan"):
+            devices = verify_candidates(client, devices, args)
+        logger.info(f"Verified candidates against the server: {len(devices)} still match")
+
+    if args.command == "view":
+        for device in devices:
+            print(device)
+        return False
+    if not confirmed(devices, args, logger):
+        return False
+
+    outcomes = run_actions(client, args.command, devices, args, logger, budget=ErrorBudget(args.max_errors, args.max_error_rate, client.deadline))
+    snapshot.remove(outcome["guid"] for outcome in outcomes if "delete" in outcome["done"])
+    summary = Summary()
+    for outcome in outcomes:
+        summary.add(outcome)
+    summary.log(logger)
+    return bool(summary.failed)
+
+
+def run_daemon(client, snapshot, args, logger):
+    """
+    Keeps running 'args.policy' on the '--schedule' with one warm client
+    and the device inventory held in 'snapshot'.
+
+    The inventory is scanned once at startup and refreshed every
+    --daemon_refresh seconds between runs (or by a run that rescanned the
+    server), so a scheduled run only has to verify its candidates instead
+    of scanning the whole fleet. --deadline applies
+    to each scheduled run. Stops on SIGTERM or Ctrl+C.
+    """
+    schedule = CronSchedule(args.schedule)
+    policy = argparse.Namespace(**dict(vars(args), command=args.policy))
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    def refresh():
+        snapshot.refresh(fetch_pages(client, {"pageSize": args.page_size}, args.page_size, args.fetch_workers))
+        return time.time()
+
+    refreshed = refresh()
+    next_run = schedule.next_after(datetime.now()).timestamp()
+    logger.info(f"Daemon started: '{args.policy}' on schedule '{args.schedule}', next run at {datetime.fromtimestamp(next_run)}")
+    try:
+        while not stop.is_set():
+            wake = min(next_run, refreshed + args.daemon_refresh)
+            if stop.wait(max(0.0, wake - time.time())):
+                break
+            try:
+                if time.time() >= next_run:
+                    STATS.reset()
+                    failed = True
+                    client.deadline = Deadline(args.deadline)
+                    try:
+                        failed = run_policy(client, snapshot, policy, logger)
+                    finally:
+                        client.deadline = Deadline()
+                        age = snapshot.age()
+                        if age is not None:
+                            # A run with many candidates rescans the server itself
+                            refreshed = max(refreshed, time.time() - age)
+                        STATS.log(logger)
+                        if args.stats_json:
+                            STATS.write_json(args.stats_json)
+                        if args.prom_file:
+                            STATS.write_prometheus(args.prom_file, args.policy, not failed)
+                    next_run = schedule.next_after(datetime.now()).timestamp()
+                    logger.info(f"Next run of '{args.policy}' at {datetime.fromtimestamp(next_run)}")
+                else:
+                    refreshed = refresh()
+            except (Exception, SystemExit) as e:
+                # A failed run or refresh must not end the daemon; the next attempt starts over
+                logger.error(f"Daemon: {type(e).__name__} {e}, retrying later")
+                refreshed = time.time()
+                next_run = max(next_run, schedule.next_after(datetime.now()).timestamp())
+    except KeyboardInterrupt:
+        pass
+    logger.info("Daemon stopped")
+
+
+def page_size_arg(value):
+    """argparse type of --page_size: a positive number or "auto"."""
+    if value == "auto":
+        return value
+    try:
+        size = int(value)
+    except ValueError:
+        size = 0
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"invalid page size: '{value}' (a positive number or 'auto')")
+    return size
 
 
 def main():
     parser = argparse.ArgumentParser(description="Device manager")
     parser.add_argument(
         "command",
-        choices=["view", "disable", "enable", "delete", "assign"],
-        help="Command to execute",
+        choices=["view", "disable", "enable", "delete", "assign", "daemon"],
+        help="Command to execute ('daemon' runs --policy on --schedule until stopped)",
     )
     parser.add_argument("--url", default=API_URL, help=f"URL of the API (Default from config: {API_URL})")
     parser.add_argument(
@@ -235,6 +2879,19 @@ def main():
         "--assign_to",
         help="<type>=<value>, e.g. user_name=mike, strategy_name=test, device_group_name=group1, note=note1, device_username=username1, device_name=name1, ab=ab1, ab=ab1,tag1,alias1,password1,note1"
     )
+    parser.add_argument(
+        "--fields", type=lambda value: tuple(field.strip() for field in value.split(",") if field.strip()), default=(),
+        help="Comma-separated extra device fields to keep and print, e.g. user_name,strategy_name, or \"*\" for all (default for 'view')"
+    )
+    parser.add_argument(
+        "--columnar", action="store_true", help="Hold the fetched inventory in arrays and filter with vectorized masks (uses NumPy if installed; bypasses the inventory snapshot)"
+    )
+    parser.add_argument(
+        "--count", action="store_true", help="Only print the number of matching devices ('view' only)"
+    )
+    parser.add_argument(
+        "--mem_report", action="store_true", help="Log the memory used by group, user and strategy names"
+    )
     parser.add_argument(
         "--offline_days", type=int, default=OFFLINE_DAYS, help=f"Offline duration in days (Default from config: {OFFLINE_DAYS})"
     )
@@ -261,8 +2918,100 @@ def main():
     parser.add_argument(
         "--disable_before_delete", action="store_true", default=DISABLE_BEFORE_DELETE, help=f"Ensure devices are disabled before deletion (Current default: {DISABLE_BEFORE_DELETE})"
     )
+    parser.add_argument(
+        "--page_size", type=page_size_arg, default=PAGE_SIZE, help=f"Number of devices requested per device list page, or 'auto' to probe the most efficient size (Current default: {PAGE_SIZE})"
+    )
+    parser.add_argument(
+        "--fetch_workers", type=int, default=FETCH_WORKERS, help=f"Number of device list pages fetched in parallel (Current default: {FETCH_WORKERS})"
+    )
+    parser.add_argument(
+        "--action_workers", type=int, default=ACTION_WORKERS, help=f"Number of devices processed in parallel (Current default: {ACTION_WORKERS})"
+    )
+    parser.add_argument(
+        "--stream", action="store_true", default=STREAM, help=f"Act on devices while later pages are still being fetched (Current default: {STREAM})"
+    )
+    parser.add_argument(
+        "--engine", choices=["threads", "async"], default=ENGINE, help=f"Request engine; 'async' requires aiohttp (Current default: {ENGINE})"
+    )
+    parser.add_argument(
+        "--adaptive", action="store_true", default=ADAPTIVE_CONCURRENCY, help=f"Adapt the number of requests in flight to the server's health (Current default: {ADAPTIVE_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--no_adaptive", action="store_false", dest="adaptive", help="Always use the full number of workers"
+    )
+    parser.add_argument(
+        "--max_rps", type=float, default=MAX_RPS, help=f"Maximum requests per second, reads and writes together (Current default: {MAX_RPS})"
+    )
+    parser.add_argument(
+        "--max_read_rps", type=float, default=MAX_READ_RPS, help=f"Maximum device list page requests per second (Current default: {MAX_READ_RPS})"
+    )
+    parser.add_argument(
+        "--max_write_rps", type=float, default=MAX_WRITE_RPS, help=f"Maximum disable/enable/delete/assign requests per second (Current default: {MAX_WRITE_RPS})"
+    )
+    parser.add_argument(
+        "--cache_file", default=CACHE_FILE, help=f"SQLite inventory snapshot, empty to disable (Current default: {CACHE_FILE})"
+    )
+    parser.add_argument(
+        "--cache_ttl", type=int, default=CACHE_TTL, help=f"Seconds a snapshot is reused by 'view' (Current default: {CACHE_TTL})"
+    )
+    parser.add_argument(
+        "--stats_json", help="Write the run statistics (phase times, per-endpoint requests and latencies) as JSON to this file"
+    )
+    parser.add_argument(
+        "--hedge", action="store_true", default=HEDGE_PAGES, help=f"Send a duplicate request for device list pages slower than the recent p95 (Current default: {HEDGE_PAGES})"
+    )
+    parser.add_argument(
+        "--connect_timeout", type=float, default=CONNECT_TIMEOUT, help=f"Seconds to wait for a connection to the server (Current default: {CONNECT_TIMEOUT})"
+    )
+    parser.add_argument(
+        "--read_timeout", type=float, default=READ_TIMEOUT, help=f"Seconds to wait for the server to answer a request (Current default: {READ_TIMEOUT})"
+    )
+    parser.add_argument(
+        "--deadline", type=float, default=RUN_DEADLINE, help=f"Stop the run after this many seconds, skipping devices not started yet (Current default: {RUN_DEADLINE})"
+    )
+    parser.add_argument(
+        "--max_retries", type=int, help=f"Retries per request on HTTP 429/5xx and connection errors (Current default: {MAX_RETRIES})"
+    )
+    parser.add_argument(
+        "--max_errors", type=int, default=MAX_ERRORS, help=f"Abort after this many failed devices (Current default: {MAX_ERRORS})"
+    )
+    parser.add_argument(
+        "--max_error_rate", type=float, default=MAX_ERROR_RATE, help=f"Abort when more than this share (0-1) of the processed devices failed (Current default: {MAX_ERROR_RATE})"
+    )
+    parser.add_argument(
+        "--journal_file", default=JOURNAL_FILE, help=f"Journal of device steps used by --resume, empty to disable (Current default: {JOURNAL_FILE})"
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="Continue the interrupted run recorded in the journal instead of scanning the server"
+    )
+    parser.add_argument(
+        "--policy", choices=["view", "disable", "enable", "delete", "assign"], default=DAEMON_POLICY,
+        help=f"Command the daemon runs on every scheduled run (Current default: {DAEMON_POLICY})"
+    )
+    parser.add_argument(
+        "--schedule", default=DAEMON_SCHEDULE, help=f"Cron-like schedule of the daemon: minute hour day month day_of_week (Current default: '{DAEMON_SCHEDULE}')"
+    )
+    parser.add_argument(
+        "--daemon_refresh", type=int, default=DAEMON_REFRESH,
+        help=f"Seconds between full inventory scans of the daemon between runs (Current default: {DAEMON_REFRESH})"
+    )
+    parser.add_argument(
+        "--prom_file", default=PROM_FILE, help=f"Write Prometheus metrics for node_exporter's textfile collector to this file (Current default: {PROM_FILE})"
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", help="Always rescan the server and refresh the snapshot"
+    )
+    parser.add_argument(
+        "--offline", action="store_true", help="Only use the snapshot, never scan the server for devices"
+    )
+    parser.add_argument(
+        "--async_limit", type=int, default=ASYNC_LIMIT, help=f"Maximum requests in flight with the async engine (Current default: {ASYNC_LIMIT})"
+    )
 
     args = parser.parse_args()
+    if args.command == "view" and not args.fields:
+        # 'view' is used to inspect devices, so it prints the whole server record
+        args.fields = ALL_FIELDS
 
     # Configure logging
     logging.basicConfig(
@@ -278,73 +3027,95 @@ def main():
     
     while args.url.endswith("/"): args.url = args.url[:-1]
 
-    devices = view(
-        args.url,
-        args.token,
-        args.id,
-        args.device_name,
-        args.user_name,
-        args.group_name,
-        args.device_group_name,
-        args.offline_days,
-        args.no_group,
-    )
-
-    if args.command == "view":
-        for device in devices:
-            print(device)
-    elif args.command in ["disable", "enable", "delete", "assign"]:
-        # Safety check for multiple devices
-        if len(devices) > 1 and not args.yes and not args.dry_run:
-            logger.warning(f"Found {len(devices)} devices. Operation '{args.command}' requires --yes or -y flag for multiple devices without interaction.")
-            print(f"Found {len(devices)} devices. Use --yes or -y to confirm this operation in a script.")
+    if "assign" in (args.command, args.policy if args.command == "daemon" else None):
+        if "=" not in (args.assign_to or ""):
+            logger.error("Invalid assign_to format, it must be <type>=<value>")
             return
-        
-        if args.command == "disable":
-            for device in devices:
-                if args.dry_run:
-                    logger.info(f"[Dry Run] Would disable device: {device['id']} (GUID: {device['guid']})")
-                else:
-                    response = disable(args.url, args.token, device["guid"], device["id"])
-                    logger.info(f"Disabled device {device['id']}: {response}")
-        elif args.command == "enable":
-            for device in devices:
-                if args.dry_run:
-                    logger.info(f"[Dry Run] Would enable device: {device['id']} (GUID: {device['guid']})")
-                else:
-                    response = enable(args.url, args.token, device["guid"], device["id"])
-                    logger.info(f"Enabled device {device['id']}: {response}")
-        elif args.command == "delete":
-            for device in devices:
-                if args.dry_run:
-                    action = "disable" if args.only_disable else "disable and delete"
-                    logger.info(f"[Dry Run] Would {action} device: {device['id']} (GUID: {device['guid']})")
-                else:
-                    # MANDATORY RUSTDESK LOGIC: A client MUST be disabled before it can be deleted.
-                    logger.info(f"Processing device {device['id']}. Disabling first (required for deletion)...")
-                    disable_response = disable(args.url, args.token, device["guid"], device["id"])
-                    logger.info(f"Disable response for {device['id']}: {disable_response}")
-                    
-                    if args.only_disable:
-                        logger.info(f"ONLY_DISABLE is active. Skipping deletion for {device['id']}.")
-                    else:
-                        # Proceeding to final deletion
-                        logger.info(f"Proceeding to delete device {device['id']}...")
-                        delete_response = delete(args.url, args.token, device["guid"], device["id"])
-                        logger.info(f"Delete response for {device['id']}: {delete_response}")
-        elif args.command == "assign":
-            if "=" not in args.assign_to:
-                logger.error("Invalid assign_to format, it must be <type>=<value>")
-                return
-            type, value = args.assign_to.split("=", 1)
-            for device in devices:
-                if args.dry_run:
-                    logger.info(f"[Dry Run] Would assign {type}={value} to device: {device['id']}")
-                else:
-                    response = assign(
-                        args.url, args.token, device["guid"], device["id"], type, value
-                    )
-                    logger.info(f"Assigned {type}={value} to {device['id']}: {response}")
+        type = args.assign_to.split("=", 1)[0]
+        if type not in ASSIGN_TYPES:
+            logger.error(f"Invalid type, it must be one of: {', '.join(ASSIGN_TYPES)}")
+            return
+    if args.count and args.command != "view":
+        logger.error("--count only applies to the 'view' command")
+        exit(1)
+
+    max_in_flight = args.async_limit if args.engine == "async" else max(args.fetch_workers, args.action_workers)
+    controller = ConcurrencyController(max_in_flight, initial=max(4, max_in_flight // 4)) if args.adaptive else None
+    limits = rate_limits(args.max_rps, args.max_read_rps, args.max_write_rps)
+    retries = retry_limits(args.max_retries)
+    timeout = (args.connect_timeout, args.read_timeout)
+    # The daemon applies the deadline to each scheduled run instead
+    deadline = Deadline(None if args.command == "daemon" else args.deadline)
+    hedge = HedgePolicy() if args.hedge else None
+
+    if args.engine == "async":
+        if aiohttp is None:
+            logger.error("The async engine requires the 'aiohttp' package: pip install aiohttp")
+            exit(1)
+        if args.stream and not args.count:
+            logger.error("--stream is only available with the threaded engine (--engine threads)")
+            exit(1)
+    SYMBOLS.track = args.mem_report
+
+    if args.command == "daemon":
+        if args.engine == "async" or args.stream or args.group_name is not None:
+            logger.error("The daemon answers from its in-memory inventory and cannot be used with --engine async, --stream or --group_name")
+            exit(1)
+        try:
+            CronSchedule(args.schedule)
+        except ValueError as e:
+            logger.error(str(e))
+            exit(1)
+        snapshot = InventoryCache(":memory:")
+        try:
+            with RustDeskClient(
+                args.url, args.token, max_in_flight, controller, limits, retries, timeout, deadline, hedge
+            ) as client:
+                if args.page_size == "auto":
+                    args.page_size = auto_page_size(client, args, None, logger)
+                run_daemon(client, snapshot, args, logger)
+        finally:
+            snapshot.close()
+        return
+
+    snapshot = open_snapshot(args, logger)
+    journal = open_journal(args, logger)
+    # Stays True if the run is aborted, so the exported metrics report a failure
+    failed = True
+    try:
+        if args.page_size == "auto" and (args.offline or (args.count and not has_local_filters(args))):
+            # Nothing or a single one-device page is fetched from the server
+            args.page_size = PAGE_SIZE_PROBES[0]
+        elif args.page_size == "auto":
+            with RustDeskClient(args.url, args.token, 1, None, limits, retries, timeout, deadline) as client:
+                args.page_size = auto_page_size(client, args, snapshot, logger)
+        # Counting needs one request or a plain page scan, the threaded client serves both
+        if args.engine == "async" and not args.count:
+            failed = asyncio.run(async_run(args, logger, controller, limits, snapshot, journal, deadline))
+        else:
+            with RustDeskClient(
+                args.url, args.token, max_in_flight, controller, limits, retries, timeout, deadline, hedge
+            ) as client:
+                failed = run(client, args, logger, snapshot, journal)
+    except REQUEST_ERRORS as e:
+        # Device failures are handled per device; these only escape when the device list cannot be read
+        logger.error(f"Could not read the device list: {e}")
+    finally:
+        if snapshot is not None:
+            snapshot.close()
+        if journal is not None:
+            journal.close()
+        STATS.log(logger)
+        if args.stats_json:
+            STATS.write_json(args.stats_json)
+        if args.prom_file:
+            STATS.write_prometheus(args.prom_file, args.command, not failed)
+    if controller is not None:
+        controller.log_summary()
+    if args.mem_report:
+        SYMBOLS.log_report(logger)
+    if failed:
+        exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+"""
+Tests for rustdesk_cleaner.py
+
+The end-to-end tests run main() against the mock server from
+benchmarks/mock_server.py. Run them from the repository root with:
+
+   python3 -m unittest discover tests
+"""
+
+import ast
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import rustdesk_cleaner  # noqa: E402
+from mock_server import simple_fleet, start_server  # noqa: E402
+from rustdesk_cleaner import CleanupJournal, CronSchedule, Device, ErrorBudget, OfflineCutoff, last_online_epoch  # noqa: E402
+
+TOKEN = "test"
+
+
+def setUpModule():
+    global LOG_DIR
+    LOG_DIR = tempfile.TemporaryDirectory()
+    # main() calls logging.basicConfig(), which keeps this configuration
+    logging.basicConfig(level=logging.INFO, handlers=[logging.FileHandler(os.path.join(LOG_DIR.name, "tests.log"))])
+
+
+def tearDownModule():
+    logging.shutdown()
+    LOG_DIR.cleanup()
+
+
+class CronScheduleTest(unittest.TestCase):
+    def test_every_fifteen_minutes(self):
+        schedule = CronSchedule("*/15 * * * *")
+        self.assertEqual(schedule.next_after(datetime(2024, 1, 1, 10, 7, 30)), datetime(2024, 1, 1, 10, 15))
+        self.assertEqual(schedule.next_after(datetime(2024, 1, 1, 10, 45)), datetime(2024, 1, 1, 11, 0))
+
+    def test_daily_rolls_over_month_and_year(self):
+        schedule = CronSchedule("0 1 * * *")
+        self.assertEqual(schedule.next_after(datetime(2024, 1, 31, 1, 0)), datetime(2024, 2, 1, 1, 0))
+        self.assertEqual(schedule.next_after(datetime(2024, 12, 31, 23, 59)), datetime(2025, 1, 1, 1, 0))
+
+    def test_day_of_week(self):
+        # 2024-01-01 is a Monday; 0 and 7 are both Sunday
+        for expression in ("30 2 * * 0", "30 2 * * 7"):
+            self.assertEqual(CronSchedule(expression).next_after(datetime(2024, 1, 1)), datetime(2024, 1, 7, 2, 30))
+
+    def test_day_of_month_or_day_of_week(self):
+        # Like cron, either restricted day field matches: the 15th or a Monday
+        schedule = CronSchedule("0 0 15 * 1")
+        self.assertEqual(schedule.next_after(datetime(2024, 1, 2)), datetime(2024, 1, 8))
+        self.assertEqual(schedule.next_after(datetime(2024, 1, 8)), datetime(2024, 1, 15))
+
+    def test_february_29(self):
+        self.assertEqual(CronSchedule("0 0 29 2 *").next_after(datetime(2025, 3, 1)), datetime(2028, 2, 29))
+
+    def test_invalid(self):
+        for expression in ("* * * *", "60 * * * *", "* * 0 * *", "* * 31 2 *"):
+            with self.assertRaises(ValueError):
+                CronSchedule(expression).next_after(datetime(2024, 1, 1))
+
+
+class LastOnlineTest(unittest.TestCase):
+    def test_last_online_epoch(self):
+        expected = datetime(2024, 1, 31, 10, 0, tzinfo=timezone.utc).timestamp()
+        for text in (
+            "2024-01-31T10:00:00",
+            "2024-01-31T10:00:00Z",
+            "2024-01-31T12:00:00+02:00",
+            "2024-01-31T09:30:00-00:30",
+        ):
+            self.assertEqual(last_online_epoch(text), expected, text)
+        self.assertAlmostEqual(last_online_epoch("2024-01-31T10:00:00.1234567"), expected + 0.123456, places=5)
+        with self.assertRaises(ValueError):
+            last_online_epoch("yesterday")
+
+    def test_offline_cutoff(self):
+        now = datetime(2024, 3, 1, tzinfo=timezone.utc).timestamp()
+        cutoff = OfflineCutoff(30, now=now)
+        # 30 days before 2024-03-01 is 2024-01-31T00:00:00
+        self.assertTrue(cutoff.matches("2024-01-31T00:00:00"))
+        self.assertTrue(cutoff.matches("2024-01-30T23:59:59.999999"))
+        self.assertFalse(cutoff.matches("2024-01-31T00:00:01"))
+        # Other layouts take the slow path
+        self.assertTrue(cutoff.matches("2024-01-31T01:00:00+01:00"))
+        self.assertFalse(cutoff.matches("2024-01-31T01:00:00Z"))
+        self.assertFalse(cutoff.matches("not a date"))
+
+
+class ErrorBudgetTest(unittest.TestCase):
+    def test_retries_count_once(self):
+        budget = ErrorBudget(max_errors=2)
+        for _ in range(3):
+            budget.add({"guid": "a", "error": "HTTP 503"})
+        self.assertEqual((budget.attempts, budget.errors), (1, 1))
+        self.assertFalse(budget.exhausted)
+        budget.add({"guid": "b", "error": "HTTP 503"})
+        self.assertTrue(budget.exhausted)
+
+    def test_success_after_failure(self):
+        budget = ErrorBudget(max_errors=10)
+        budget.add({"guid": "a", "error": "HTTP 503"})
+        budget.add({"guid": "a"})
+        self.assertEqual((budget.attempts, budget.errors), (1, 1))
+
+    def test_error_rate(self):
+        budget = ErrorBudget(max_error_rate=0.5)
+        for i in range(ErrorBudget.MIN_SAMPLE - 1):
+            budget.add({"guid": str(i), "error": "HTTP 503"})
+        # Below the minimum sample a high rate does not abort the run
+        self.assertFalse(budget.exhausted)
+        budget.add({"guid": "last", "error": "HTTP 503"})
+        self.assertTrue(budget.exhausted)
+
+
+class CleanupJournalTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cleanup.journal")
+
+    def write_run(self, devices):
+        journal = CleanupJournal(self.path, sync_every=1)
+        journal.start({"command": "delete", "only_disable": False, "assign_to": None, "started": "now"}, devices)
+        return journal
+
+    def test_load(self):
+        devices = [Device("a", "1"), Device("b", "2")]
+        journal = self.write_run(devices)
+        journal.record("a", "disable")
+        journal.record("a", "delete")
+        journal.fail("b", "HTTP 503")
+        journal.close()
+
+        loaded = CleanupJournal(self.path)
+        self.assertTrue(loaded.load())
+        self.assertEqual(loaded.header["command"], "delete")
+        self.assertEqual([device["guid"] for device in loaded.planned], ["a", "b"])
+        self.assertEqual(loaded.completed("a"), {"disable", "delete"})
+        self.assertEqual(loaded.completed("b"), ())
+        self.assertFalse(loaded.finished)
+
+    def test_load_missing_or_torn(self):
+        self.assertFalse(CleanupJournal(self.path).load())
+        journal = self.write_run([Device("a", "1")])
+        journal.close()
+        with open(self.path, "a") as f:
+            f.write('{"guid": "a", "st')
+        loaded = CleanupJournal(self.path)
+        self.assertTrue(loaded.load())
+        self.assertEqual(loaded.completed("a"), ())
+
+    def test_resume_appends_and_finishes(self):
+        self.write_run([Device("a", "1")]).close()
+        journal = CleanupJournal(self.path)
+        journal.load()
+        journal.resume()
+        journal.record("a", "disable")
+        journal.finish()
+        journal.close()
+
+        loaded = CleanupJournal(self.path)
+        loaded.load()
+        self.assertEqual(loaded.completed("a"), {"disable"})
+        self.assertTrue(loaded.finished)
+
+    def test_finish_of_finished_run(self):
+        journal = self.write_run([Device("a", "1")])
+        journal.finish()
+        journal.close()
+        # --resume of a finished run does not reopen the journal
+        loaded = CleanupJournal(self.path)
+        loaded.load()
+        loaded.finish()
+        loaded.close()
+
+
+class MainTest(unittest.TestCase):
+    """Runs main() against the mock server."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.journal = os.path.join(self.directory, "cleanup.journal")
+
+    def start_server(self, devices, **options):
+        server = start_server(devices, token=TOKEN, **options)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def main(self, server, command, *options):
+        """Runs main() and returns (exit code, stdout)."""
+        argv = [
+            "rustdesk_cleaner.py", command, "--url", server.url, "--token", TOKEN,
+            "--journal_file", self.journal, "--cache_file", "",
+            "--log_file", os.path.join(self.directory, "cleanup.log"),
+            "--offline_days", "30", "--yes", *options,
+        ]
+        stdout = io.StringIO()
+        code = 0
+        with mock.patch.object(sys, "argv", argv), contextlib.redirect_stdout(stdout):
+            try:
+                rustdesk_cleaner.main()
+            except SystemExit as e:
+                code = e.code
+        return code, stdout.getvalue()
+
+    def candidates(self, server):
+        cutoff = (datetime.utcnow() - timedelta(days=30)).isoformat()
+        return {
+            device["guid"] for device in server.state.devices.values()
+            if not device["device_group_name"] and device["last_online"] <= cutoff
+        }
+
+    def test_view_prints_full_records(self):
+        server = self.start_server(simple_fleet(300))
+        for engine in ("threads", "async"):
+            code, output = self.main(server, "view", "--engine", engine)
+            self.assertEqual(code, 0)
+            devices = [ast.literal_eval(line) for line in output.splitlines()]
+            self.assertEqual({device["guid"] for device in devices}, self.candidates(server))
+            for device in devices:
+                self.assertEqual(device, server.state.devices[device["guid"]])
+
+    def test_delete(self):
+        server = self.start_server(simple_fleet(300))
+        candidates = self.candidates(server)
+        for engine in ("threads", "async"):
+            with self.subTest(engine=engine):
+                remaining = set(server.state.devices) - candidates
+                code, _ = self.main(server, "delete", "--no_dry_run", "--engine", engine)
+                self.assertEqual(code, 0)
+                self.assertEqual(set(server.state.devices), remaining)
+                journal = CleanupJournal(self.journal)
+                journal.load()
+                self.assertTrue(journal.finished)
+                self.assertEqual(len(journal.planned), len(candidates))
+                candidates = self.candidates(server)
+
+    def test_resume_finished_run(self):
+        server = self.start_server(simple_fleet(100))
+        self.assertEqual(self.main(server, "delete", "--no_dry_run")[0], 0)
+        # Resuming a finished run does nothing, however often it is repeated
+        for _ in range(2):
+            self.assertEqual(self.main(server, "delete", "--no_dry_run", "--resume")[0], 0)
+
+    def test_resume_after_deadline(self):
+        server = self.start_server(simple_fleet(1000), latency_ms=30)
+        candidates = self.candidates(server)
+        self.main(server, "delete", "--no_dry_run", "--deadline", "1")
+        journal = CleanupJournal(self.journal)
+        journal.load()
+        self.assertFalse(journal.finished, "the skipped devices must stay resumable")
+        self.assertTrue(candidates & set(server.state.devices), "the deadline did not skip any device")
+
+        server.options.latency_ms = 0
+        self.assertEqual(self.main(server, "delete", "--no_dry_run", "--resume")[0], 0)
+        self.assertFalse(candidates & set(server.state.devices))
+        journal = CleanupJournal(self.journal)
+        journal.load()
+        self.assertTrue(journal.finished)
+
+
+if __name__ == "__main__":
+    unittest.main()